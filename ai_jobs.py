@@ -0,0 +1,96 @@
+# ai_jobs.py
+# ------------------------------------------------------
+#  BACKGROUND AI ANALYSIS + PERSISTENT RESULT CACHE
+# ------------------------------------------------------
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import single_flight
+
+
+def cache_key(prompt, data_version):
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{digest}:{data_version}"
+
+
+class AIJobs:
+    """
+    Runs the AI call off the request thread.
+
+    Finished answers are stored in ai_results (DatabaseManager), so a
+    reload under unchanged data never calls the provider again. A
+    failed attempt is stored there too, so a poll on any worker sees
+    it; the next page load clears it and retries. One worker asks per
+    key (cache_locks lease); the others poll ai_results.
+    """
+
+    LEASE = 120   # seconds a provider call may hold its key
+
+    def __init__(self, db, ask, max_workers=1):
+        self.db = db
+        self.ask = ask
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai")
+        self.lock = threading.Lock()
+        self.pending = {}      # key -> Future
+
+    # ------------------------------------------------------
+    # PAGE LOOKUP
+    # ------------------------------------------------------
+    def get_or_schedule(self, prompt, data_version, filter_key="*"):
+        """
+        Returns (key, output, fresh).
+        fresh=False -> output is the last cached answer for the same
+        time filter (or None) and the new one is being computed in the
+        background.
+        """
+        key = cache_key(prompt, data_version)
+
+        output = self.db.get_ai_result(key)
+        if output is not None:
+            return key, output, True
+
+        self.submit(key, prompt, data_version, filter_key)
+        return key, self.db.get_latest_ai_result(filter_key), False
+
+    def submit(self, key, prompt, data_version, filter_key="*"):
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+
+            self.db.clear_ai_error(key)
+            future = self.pool.submit(self._run, key, prompt, data_version, filter_key)
+            self.pending[key] = future
+            return future
+
+    def _run(self, key, prompt, data_version, filter_key):
+        try:
+            with single_flight(self.db, key, self.LEASE) as held:
+                # another worker is asking, or already answered
+                if not held or self.db.get_ai_result(key) is not None:
+                    return None
+
+                output = self.ask(prompt)
+                if output is None or str(output).startswith("AI Error"):
+                    self.db.store_ai_error(
+                        key, data_version, output or "AI Error: empty response", filter_key
+                    )
+                else:
+                    self.db.store_ai_result(key, data_version, output, filter_key)
+                return output
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    # ------------------------------------------------------
+    # POLLING
+    # ------------------------------------------------------
+    def status(self, key):
+        """{"ready": bool, "output": str|None, "error": str|None}"""
+        stored = self.db.get_ai_status(key)
+        if stored is None:
+            return {"ready": False, "output": None, "error": None}
+
+        output, error = stored
+        return {"ready": True, "output": output, "error": error}
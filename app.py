@@ -1,12 +1,88 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, g, has_request_context, jsonify, url_for, make_response, Response
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
+from functools import wraps
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import time
 from database_manager import DatabaseManager
+from history_store import HistorySnapshot, ColumnStore, HistoryWindow, FULL_HISTORY
+from ai_jobs import AIJobs
+from sequence_index import FollowIndexCache
 from collections import Counter
-from pattern_engine import analyze_history_patterns
-from pattern_engine_cust import PatternEngine
+from pattern_engine import analyze_history_patterns, category_tasks, CATEGORIES, ANALYSIS_TAIL
+from pattern_engine_find import patterns_task, analyze_patterns
+from engine_pool import pool_from_env, run_tasks
+from precompute import AnalyticsPrecompute, filter_key
+from result_cache import ResultCache
+from metrics import metrics, timed, server_timing
 import requests
 
 app = Flask(__name__)
-db = DatabaseManager("lottery.db")
+
+# per-process services, started by create_app() (gunicorn
+# "app:create_app()" / python app.py), never on import: spawned engine
+# workers import this module and must not migrate / load / connect
+db = None             # DatabaseManager
+store = None          # ColumnStore: digit columns, extended on every save
+engine_pool = None    # EnginePool, or None = engines run inline
+client = None         # Groq
+ai_jobs = None        # AIJobs
+precompute = None     # AnalyticsPrecompute
+result_cache = None   # ResultCache
+
+# draws each engine looks back over on the page, so latency stays flat
+# as history grows. Per request: ?window=N (or "all") / ?since=YYYY-MM-DD,
+# or ?<engine>_window= / ?<engine>_since= for one engine. Called
+# directly (tests, offline analysis) the engines still see everything.
+DEFAULT_WINDOW = 1000
+
+ENGINE_WINDOWS = {
+    "summary": HistoryWindow(last_n=DEFAULT_WINDOW),      # summary, AI prompt, LAST4 matrix
+    "predictions": HistoryWindow(last_n=DEFAULT_WINDOW),  # follow-sequence levels
+    "patterns": HistoryWindow(last_n=DEFAULT_WINDOW),     # analyze_history_patterns
+    "find": HistoryWindow(last_n=DEFAULT_WINDOW),         # analyze_patterns
+}
+
+
+# -------------------------------------------------------
+# RELEASE STAMP (HTTP VALIDATORS + STORED RESULTS)
+# -------------------------------------------------------
+def release_stamp():
+    """
+    What this process serves: $RELEASE (e.g. the git SHA, set at
+    deploy) or else a hash of every module and template, plus the
+    engine settings. ETags and stored results carry it, so a deploy
+    never revalidates or serves output of the previous code.
+    """
+    digest = hashlib.sha1(
+        repr((sorted(ENGINE_WINDOWS.items()), ANALYSIS_TAIL)).encode("utf-8")
+    )
+
+    release = os.getenv("RELEASE") or os.getenv("SOURCE_VERSION")
+    if release:
+        digest.update(release.encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    root = app.root_path
+    files = glob.glob(os.path.join(root, "*.py")) + glob.glob(
+        os.path.join(root, "templates", "**", "*.html"), recursive=True
+    )
+    for path in sorted(files):
+        digest.update(os.path.relpath(path, root).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()[:16]
+
+
+RELEASE = release_stamp()
+
+# Last-Modified is never older than this process (a deploy restarts it)
+STARTED = time.time()
 
 
 
@@ -37,107 +113,97 @@ def detect_trend(values):
 
 
 # -------------------------------------------------------
-# FOLLOW FIXED SEQUENCE
+# REQUEST-SCOPED HISTORY (ONE QUERY PER FILTER PER REQUEST)
 # -------------------------------------------------------
-def follow_sequence(full_list, base_seq):
-    results = []
-    L = len(base_seq)
-
-    base_values = [x["value"] for x in base_seq]
+def load_history(time_filter=None, window=None):
+    window = window or FULL_HISTORY
 
-    for i in range(len(full_list) - L):
-        window = full_list[i:i + L]
-        window_values = [x["value"] for x in window]
+    def fetch():
+        with timed("db"):
+            return HistorySnapshot(
+                db.get_all_history(time_filter, window.last_n, window.since)
+            )
 
-        if window_values == base_values:
-            next_item = full_list[i + L]
+    if not has_request_context():
+        return fetch()
 
-            results.append({
-                "matched": base_values[:],
-                "next": {
-                    "value": next_item["value"],
-                    "id": next_item["id"]   # 👈 related ID
-                }
-            })
+    key = (tuple(time_filter) if time_filter else None, window)
 
-    return results
+    cache = g.setdefault("history_snapshots", {})
+    if key not in cache:
+        cache[key] = fetch()
 
+    return cache[key]
 
-# def follow_sequence(full_list, base_seq):
-#     results = []
-#     L = len(base_seq)
 
-#     for i in range(len(full_list) - L + 1):
-#         if full_list[i:i + L] == base_seq:
-#             before = full_list[max(0, i-L):i]
-#             matched = base_seq[:]
-#             after = full_list[i + L:]
-
-#             results.append({
-#                 "before": before,
-#                 "matched": matched,
-#                 "after": after
-#             })
-
-#     return results
-
-# -------------------------------------------------------
-# BUILD LEVELS
-# -------------------------------------------------------
-def build_levels(values):
-    res = {}
-
-    if len(values) >= 4:
-        b = values[-4:]
-        res["last4"] = {"base": b, "matches": follow_sequence(values, b)}
+def valid_day(text):
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
 
-    if len(values) >= 3:
-        b = values[-3:]
-        res["last3"] = {"base": b, "matches": follow_sequence(values, b)}
 
-    if len(values) >= 2:
-        b = values[-2:]
-        res["last2"] = {"base": b, "matches": follow_sequence(values, b)}
+def request_window(engine):
+    """
+    ENGINE_WINDOWS[engine], unless the request asks for another one.
+    A window that is neither "all" nor a positive count, or a since
+    that is not a YYYY-MM-DD date, counts as not given: a bad value
+    never turns into a full-history scan.
+    """
+    args = request.args
+    last_n = args.get(f"{engine}_window", args.get("window"))
+    since = args.get(f"{engine}_since", args.get("since"))
 
-    if len(values) >= 1:
-        b = values[-1:]
-        res["last1"] = {"base": b, "matches": follow_sequence(values, b)}
+    if last_n is not None and last_n.lower() != "all":
+        if not (last_n.isdecimal() and int(last_n) > 0):
+            last_n = None
+    if since is not None and not valid_day(since):
+        since = None
 
-    return res
+    if last_n is None and since is None:
+        return ENGINE_WINDOWS.get(engine, FULL_HISTORY)
 
+    if last_n is not None:
+        last_n = None if last_n.lower() == "all" else int(last_n)
+    return HistoryWindow(last_n, since)
 
 
 # -------------------------------------------------------
 # PREDICTIONS
 # -------------------------------------------------------
-def build_predictions(time_filter):
-    rows = db.get_all_history(time_filter)
-    if not rows:
+PREDICTION_FIELDS = {
+    "4digit": "LAST4",
+    "3digit": "LAST3",
+    "ab": "AB",
+    "bc": "BC",
+    "ac": "AC",
+    "a": "A",
+    "b": "B",
+    "c": "C"
+}
+
+
+# follow indexes kept across requests, extended as draws arrive
+follow_indexes = FollowIndexCache()
+
+
+def build_predictions(time_filter, snapshot=None, window=None):
+    window = window or FULL_HISTORY
+    snapshot = snapshot or load_history(time_filter, window)
+    if not snapshot.rows:
         return {}
 
-    fields = {
-        "4digit": "last4",
-        "3digit": "last3",
-        "ab": "last2_ab",
-        "bc": "last2_bc",
-        "ac": "last2_ac",
-        "a": "a_third",
-        "b": "b_fourth",
-        "c": "c_last"
-    }
-
-    # store dicts instead of plain values
-    sequences = {k: [] for k in fields}
-
-    for r in rows:
-        for key, col in fields.items():
-            if r[col]:
-                sequences[key].append({
-                    "value": r[col],
-                    "id": r["id"]          # 👈 important
-                })
+    filter_key = tuple(time_filter) if time_filter else None
 
-    predictions = {key: build_levels(seq) for key, seq in sequences.items()}
+    # matches carry value + related ID; one index per filter and
+    # field whatever the window, extended as draws arrive
+    predictions = {
+        key: follow_indexes.levels(
+            (filter_key, key), snapshot.columns[view], snapshot.ids[view]
+        )
+        for key, view in PREDICTION_FIELDS.items()
+    }
     return predictions
 
 
@@ -145,48 +211,10 @@ def build_predictions(time_filter):
 # -------------------------------------------------------
 # MERGED HISTORY FUNCTION (USE THIS ONLY)
 # -------------------------------------------------------
-def get_history(time_filter=None):
-    rows = db.get_all_history(time_filter)
-
-    history = {
-        "date_col": [],
-        "time_col": [],
-        "Winner": [],
-        "LAST4": [],
-        "LAST3": [],
-        "AB": [],
-        "BC": [],
-        "AC": [],
-        "A": [],
-        "B": [],
-        "C": []
-    }
-
-    for r in rows:
-        if r["date_col"]:
-            history["date_col"].append(r["date_col"])
-        if r["time_col"]:
-            history["time_col"].append(r["time_col"])
-        if r["Winner"]:
-            history["Winner"].append(r["Winner"])
-        if r["last4"]:
-            history["LAST4"].append(r["last4"])
-        if r["last3"]:
-            history["LAST3"].append(r["last3"])
-        if r["last2_ab"]:
-            history["AB"].append(r["last2_ab"])
-        if r["last2_bc"]:
-            history["BC"].append(r["last2_bc"])
-        if r["last2_ac"]:
-            history["AC"].append(r["last2_ac"])
-        if r["a_third"]:
-            history["A"].append(r["a_third"])
-        if r["b_fourth"]:
-            history["B"].append(r["b_fourth"])
-        if r["c_last"]:
-            history["C"].append(r["c_last"])
-
-    return history
+def get_history(time_filter=None, snapshot=None, window=None):
+    snapshot = snapshot or load_history(time_filter, window)
+    with timed("history"):
+        return snapshot.history()
 
 
 # -------------------------------------------------------
@@ -273,10 +301,8 @@ def build_ai_prompt(history):
 
 # -------------------------------------------------------
 # CALL GROQ AI
-import os
 from groq import Groq
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
 def ask_groq_ai(prompt):
     try:
@@ -353,139 +379,381 @@ def predict_next_last4(history_last4):
 
     return f"{A_next}{B_next}{C_next}{D_next}"
 
-def build_history_dict(rows):
-    if not rows:
-        return {}
+# -------------------------------------------------------
+# PATTERN ENGINES, FANNED OUT
+# -------------------------------------------------------
+def run_pattern_engines(jobs, pool=None):
+    """
+    jobs: [(patterns_view, find_view), ...], e.g. one per time-slot filter
+    -> [(analyze_history_patterns(...), analyze_patterns(...)), ...]
 
-    history = {
-        "LAST4": [],
-        "LAST3": [],
-        "AB": [],
-        "BC": [],
-        "AC": [],
-        "A": [],
-        "B": [],
-        "C": []
-    }
+    Every category of every job plus each empirical run is one task;
+    results come back in job order whatever the pool does.
+    """
+    tasks = []
+    for patterns_view, find_view in jobs:
+        tasks.extend(category_tasks(patterns_view))
+        tasks.append(patterns_task(find_view))
 
-    for row in rows:
+    results = run_tasks(tasks, pool or engine_pool)
+
+    step = len(CATEGORIES) + 1
+    return [
+        (dict(zip(CATEGORIES, results[i:i + step - 1])), results[i + step - 1])
+        for i in range(0, len(results), step)
+    ]
+
+
+# -------------------------------------------------------
+# PRECOMPUTED PANELS (ALL / EACH SLOT / PINNED SLOT SETS)
+# -------------------------------------------------------
+PRECOMPUTED_ENGINES = ("predictions", "patterns", "find")
 
-        # 4-digit
-        if "last4" in row.keys() and row["last4"]:
-            history["LAST4"].append(str(row["last4"]))
 
-        # 3-digit
-        if "last3" in row.keys() and row["last3"]:
-            history["LAST3"].append(str(row["last3"]))
+def compute_engines(time_filters):
+    """
+    [time_filter, ...] -> [{"predictions", "patterns", "find"}, ...]
+    as the panels show them (default ENGINE_WINDOWS), JSON-ready.
+    """
+    store.sync()
+    jobs = [
+        (store.view(tf, ENGINE_WINDOWS["patterns"]), store.view(tf, ENGINE_WINDOWS["find"]))
+        for tf in time_filters
+    ]
+    engines = run_pattern_engines(jobs)
 
-        # AB / BC / AC (2-digit pairs)
-        if "last2_ab" in row.keys() and row["last2_ab"]:
-            history["AB"].append(str(row["last2_ab"]))
+    return [
+        jsonable({
+            "predictions": build_predictions(tf, window=ENGINE_WINDOWS["predictions"]),
+            "patterns": patterns,
+            "find": find,
+        })
+        for tf, (patterns, find) in zip(time_filters, engines)
+    ]
 
-        if "last2_bc" in row.keys() and row["last2_bc"]:
-            history["BC"].append(str(row["last2_bc"]))
 
-        if "last2_ac" in row.keys() and row["last2_ac"]:
-            history["AC"].append(str(row["last2_ac"]))
 
-        # A, B, C (single digits)
-        if "a_third" in row.keys() and row["a_third"]:
-            history["A"].append(str(row["a_third"]))
+def panel_data(engine, time_filter, window, compute):
+    """
+    Panel result for (engine, time_filter, window): the precomputed
+    snapshot, else the shared cache, else compute() once (any worker).
+    """
+    def run():
+        with timed(engine):
+            return jsonable(compute())
 
-        if "b_fourth" in row.keys() and row["b_fourth"]:
-            history["B"].append(str(row["b_fourth"]))
+    with timed("cache"):
+        if window == ENGINE_WINDOWS[engine]:
+            data = precompute.lookup(time_filter, engine)
+            if data is not None:
+                return data
 
-        if "c_last" in row.keys() and row["c_last"]:
-            history["C"].append(str(row["c_last"]))
+        key = [filter_key(time_filter), window.last_n, window.since]
+        version = db.get_data_version(time_filter)
 
-    return history
+    return result_cache.get_or_compute(engine, key, version, run)
 
 # -------------------------------------------------------
-# MAIN PAGE
+# REQUEST FILTERS (PAGE + PANELS)
 # -------------------------------------------------------
-@app.route("/")
-def index():
+LATEST_PANEL_SLOTS = ["1 PM", "6 PM", "8 PM"]
+MAX_LATEST_N = 20          # ?latest_n= is clamped to 1..this
 
-    selected_lottery = request.args.get("lottery_name", "")
-    selected_date = request.args.get("date_col", "")
-    selected_times = request.args.getlist("time_col")
+# query args that only move the lottery table, not the analytics
+PAGING_ARGS = ("page", "after", "before")
 
-    page = int(request.args.get("page", 1))
 
-    filters = db.get_lottery_filters()
-    
-    rows, total = db.get_lottery_rows(
-        selected_lottery or None,
-        selected_date or None,
-        selected_times or None,
-        page
+def request_filters():
+    return (
+        request.args.get("lottery_name", ""),
+        request.args.get("date_col", ""),
+        request.args.getlist("time_col"),
     )
 
-    total_pages = max((total + 2) // 3, 1)
-
-    history = get_history(selected_times or None)
 
-    ai_summary = generate_historical_summary(history)
-    final_prediction = build_final_prediction(ai_summary)
+def jsonable(value):
+    """Engine results -> plain JSON values (records, sqlite rows, tuples)."""
+    if hasattr(value, "to_dict"):
+        return jsonable(value.to_dict())
+    if isinstance(value, sqlite3.Row):
+        return dict(value)
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    return value
 
-    # AI (Groq) – A,B,C matrix on LAST3
-    prompt = build_ai_prompt(history)
-    ai_output = ask_groq_ai(prompt)
 
-    rowsHis = db.get_all_history(selected_times or None)
-    historyData = build_history_dict(rowsHis)
-    pattern_results = analyze_history_patterns(historyData)
+def panel_response(name, data, **context):
+    """
+    {"panel", "data"} for API clients; with ?html=1 also the rendered
+    templates/panels/<name>.html fragment the page drops in place.
+    """
+    payload = {"panel": name, "data": jsonable(data)}
+    if request.args.get("html"):
+        with timed("render"):
+            payload["html"] = render_template(f"panels/{name}.html", **context)
+    return jsonify(payload)
 
-    predictions = build_predictions(selected_times or None)
 
-    from pattern_engine_find import analyze_patterns
+# -------------------------------------------------------
+# CONDITIONAL RESPONSES (ETag / Last-Modified)
+# -------------------------------------------------------
+# browsers keep the page but revalidate it: a reload between draws
+# costs one version lookup and a 304
+CACHE_CONTROL = "private, no-cache"
 
-    historyDataFind = db.get_all_history(selected_times or None)
 
-  # safe printing for both old and new output shapes
-    pattern_results_find_full = analyze_patterns(historyDataFind)
+def data_etag(version):
+    """Data version + path + query args (+ release) -> ETag value."""
+    args = sorted(request.args.items(multi=True))
+    raw = repr((version, RELEASE, request.path, args))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
 
+def conditional(view):
+    """
+    ETag / Last-Modified from the global data version; 304 without
+    running the view when the client already has that version.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, updated_at = db.get_data_stamp()
+        etag = data_etag(version)
+        modified = None
+        if updated_at:
+            modified = datetime.fromtimestamp(int(max(updated_at, STARTED)), timezone.utc)
+
+        if is_resource_modified(request.environ, etag=etag, last_modified=modified):
+            response = make_response(view(*args, **kwargs))
+        else:
+            response = app.response_class(status=304)
+
+        response.set_etag(etag)
+        if modified:
+            response.last_modified = modified
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+
+    return wrapper
+
+
+def rows_context():
+    selected_lottery, selected_date, selected_times = request_filters()
+    page = int(request.args.get("page", 1))
 
+    with timed("db"):
+        rows, total, page_nav = db.get_lottery_rows(
+            selected_lottery or None,
+            selected_date or None,
+            selected_times or None,
+            page,
+            after=request.args.get("after"),
+            before=request.args.get("before")
+        )
 
-    # ✅ Your requested change: use LAST4 for numeric prediction
-    correct_last3_prediction = predict_next_last4(history["LAST4"])
-
-    last4_1pm = db.get_last4("1 PM")
-    last4_6pm = db.get_last4("6 PM")
-    last4_8pm = db.get_last4("8 PM")
-    last4_combined = db.get_last4("COMBINED")
-    engine = PatternEngine()
-    
-
-    return render_template(
-        "index.html",
-        filters=filters,
+    return dict(
         rows=rows,
-        total_pages=total_pages,
+        total=total,
+        total_pages=max((total + 2) // 3, 1),
         page=page,
+        page_nav=page_nav,
         selected_lottery=selected_lottery,
         selected_date=selected_date,
         selected_time=selected_times,
-        predictions=predictions,
-        ai_summary=ai_summary,
-        final_prediction=final_prediction,
-        last4_1pm=last4_1pm,
-        last4_6pm=last4_6pm,
-        last4_8pm=last4_8pm,
-        last4_combined=last4_combined,
-        ai_output=ai_output,
-        correct_last3_prediction=correct_last3_prediction,
-        pattern_results=pattern_results, 
-        pattern_results_find=pattern_results_find_full,
     )
 
 
+# -------------------------------------------------------
+# MAIN PAGE (TABLE NOW, ANALYTICS PANELS FETCHED BY THE PAGE)
+# -------------------------------------------------------
+@app.route("/")
+@conditional
+def index():
+    context = rows_context()
+
+    # the analytics panels share the filters but not the paging args
+    panel_args = {
+        k: v for k, v in request.args.to_dict(flat=False).items()
+        if k not in PAGING_ARGS
+    }
+
+    with timed("db"):
+        filters = db.get_lottery_filters()
+
+    with timed("render"):
+        return render_template(
+            "index.html",
+            filters=filters,
+            panel_args=panel_args,
+            **context
+        )
+
+
+# -------------------------------------------------------
+# PANEL ENDPOINTS
+# -------------------------------------------------------
+@app.route("/api/rows")
+@conditional
+def api_rows():
+    context = rows_context()
+    data = {
+        "rows": context["rows"],
+        "total": context["total"],
+        "total_pages": context["total_pages"],
+        "page": context["page"],
+        "nav": context["page_nav"],
+    }
+    return panel_response("rows", data, **context)
+
+
+@app.route("/api/predictions")
+@conditional
+def api_predictions():
+    time_filter = request_filters()[2] or None
+    window = request_window("predictions")
+
+    predictions = panel_data(
+        "predictions", time_filter, window,
+        lambda: build_predictions(
+            time_filter, snapshot=load_history(time_filter, window), window=window
+        )
+    )
+    return panel_response(
+        "predictions", predictions,
+        predictions=predictions, selected_time=request_filters()[2]
+    )
+
+
+@app.route("/api/patterns")
+@conditional
+def api_patterns():
+    time_filter = request_filters()[2] or None
+
+    window = request_window("patterns")
+
+    # pre-parsed digit columns (pick up rows saved by other workers)
+    pattern_results = panel_data(
+        "patterns", time_filter, window,
+        lambda: analyze_history_patterns(
+            store.sync().view(time_filter, window), pool=engine_pool
+        )
+    )
+
+    return panel_response("patterns", pattern_results, pattern_results=pattern_results)
+
+
+@app.route("/api/find")
+@conditional
+def api_find():
+    time_filter = request_filters()[2] or None
+
+    window = request_window("find")
+
+    pattern_results_find = panel_data(
+        "find", time_filter, window,
+        lambda: analyze_patterns(store.sync().view(time_filter, window))
+    )
+
+    return panel_response(
+        "find", pattern_results_find, pattern_results_find=pattern_results_find
+    )
+
+
+@app.route("/api/latest")
+@conditional
+def api_latest():
+    time_filter = request_filters()[2] or None
+
+    # latest-draw panels straight from the in-memory recent draws
+    latest_n = max(1, min(request.args.get("latest_n", 4, type=int), MAX_LATEST_N))
+    with timed("latest"):
+        latest = store.sync().latest_panels(LATEST_PANEL_SLOTS, latest_n)
+
+    # ✅ Your requested change: use LAST4 for numeric prediction
+    history = get_history(time_filter, window=request_window("summary"))
+    with timed("last4"):
+        last4_prediction = predict_next_last4(history["LAST4"])
+
+    data = {"latest": latest, "last4_prediction": last4_prediction}
+    return panel_response(
+        "latest", data,
+        latest=latest, latest_n=latest_n, slots=LATEST_PANEL_SLOTS,
+        last4_prediction=last4_prediction
+    )
+
+
+# no ETag: the answer changes when the background job finishes
+@app.route("/api/ai")
+def api_ai():
+    time_filter = request_filters()[2] or None
+    history = get_history(time_filter, window=request_window("summary"))
+
+    with timed("summary"):
+        ai_summary = generate_historical_summary(history)
+        final_prediction = build_final_prediction(ai_summary)
+
+    # AI (Groq) – A,B,C matrix on LAST3 (never blocks the page)
+    prompt = build_ai_prompt(history)
+    ai_key, ai_output, ai_fresh = ai_jobs.get_or_schedule(
+        prompt, db.get_data_version(time_filter), filter_key(time_filter)
+    )
+
+    data = {
+        "key": ai_key,
+        "output": ai_output,
+        "fresh": ai_fresh,
+        "poll": url_for("ai_result", key=ai_key),
+        "summary": ai_summary,
+        "final_prediction": final_prediction,
+    }
+    return panel_response(
+        "ai", data, ai_output=ai_output, ai_fresh=ai_fresh, ai_key=ai_key
+    )
+
+
+# -------------------------------------------------------
+# AI RESULT POLLING
+# -------------------------------------------------------
+@app.route("/ai_result/<key>")
+def ai_result(key):
+    return jsonify(ai_jobs.status(key))
+
+
+# -------------------------------------------------------
+# REQUEST TIMING (Server-Timing header + /metrics)
+# -------------------------------------------------------
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_timing(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or "unknown"
+
+    metrics.observe("lotapp_request_seconds", endpoint, elapsed)
+    if not response.is_streamed:
+        metrics.observe("lotapp_response_bytes", endpoint, response.calculate_content_length() or 0)
+
+    response.headers["Server-Timing"] = server_timing(elapsed)
+    return response
+
+
+@app.route("/metrics")
+def metrics_text():
+    # per worker process: scrape each worker (or run --workers 1)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # -------------------------------------------------------
 # SAVE RECORD
 # -------------------------------------------------------
-import re
-from flask import request
 @app.route("/save_record", methods=["POST"])
 def save_record():
 
@@ -534,8 +802,44 @@ def save_record():
     }
 
     db.store_lottery_data([record])
+    store.sync()
+    precompute.schedule()
     return "<h3>Record Saved Successfully! <a href='/'>Go Back</a></h3>"
 
+# -------------------------------------------------------
+# APP FACTORY (ONCE PER PROCESS)
+# -------------------------------------------------------
+def create_app(db_path="lottery.db"):
+    global db, store, engine_pool, client, ai_jobs, precompute, result_cache
+
+    if db is not None:
+        return app
+
+    db = DatabaseManager(db_path)
+    store = ColumnStore(db).load()
+
+    # CPU-bound engines fan out over processes only when asked:
+    # ENGINE_WORKERS=auto (usable cores) or a number; unset = inline
+    engine_pool = pool_from_env("ENGINE_WORKERS")
+
+    # AI answers are computed in the background and cached in lottery.db
+    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    ai_jobs = AIJobs(db, timed("groq")(ask_groq_ai))
+
+    # snapshots live in lottery.db, so every worker serves them
+    precompute = AnalyticsPrecompute(db, compute_engines, PRECOMPUTED_ENGINES, RELEASE)
+
+    # any other filter / window: computed once, shared by all workers
+    result_cache = ResultCache(
+        db,
+        RELEASE,
+        max_bytes=int(os.getenv("RESULT_CACHE_MB", "64")) * 1024 * 1024,
+        ttl=int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+    )
+
+    return app
+
+
 if __name__ == "__main__":
-    # app.run(debug=True)    
-    app.run(host="0.0.0.0", port=10000)
+    # create_app().run(debug=True)
+    create_app().run(host="0.0.0.0", port=10000)
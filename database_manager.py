@@ -1,26 +1,122 @@
+import base64
+import os
 import sqlite3
 import threading
+import time
+
+
+# -------------------------------------------------------
+# SORT HELPERS
+# -------------------------------------------------------
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+# Draw order inside a single day (unknown slots rank with 9 PM)
+TIME_RANK = {
+    "12.30 AM": 1,
+    "1 PM": 2,
+    "3 PM": 3,
+    "5.30 PM": 4,
+    "6 PM": 5,
+    "7.30 PM": 6,
+    "8 PM": 7,
+    "9 PM": 8,
+    "10 PM": 9,
+}
+DEFAULT_TIME_RANK = 8
+
+
+def draw_sort_key(date_col, time_col):
+    """
+    "5 December 2025", "6 PM"  ->  "2025-12-05 05"
+    Plain string compare gives chronological draw order.
+    """
+    date_col = str(date_col or "").strip()
+    lowered = date_col.lower()
+
+    year = date_col[-4:]
+
+    month = "00"
+    for i, name in enumerate(MONTHS, start=1):
+        if name.lower() in lowered:
+            month = f"{i:02d}"
+            break
+
+    first = date_col.split(" ", 1)[0] if " " in date_col else ""
+    day_digits = ""
+    for ch in first:
+        if not ch.isdigit():
+            break
+        day_digits += ch
+    day = int(day_digits) if day_digits else 0
+
+    rank = TIME_RANK.get(time_col, DEFAULT_TIME_RANK)
+
+    return f"{year}-{month}-{day:02d} {rank:02d}"
 
 
 class DatabaseManager:
+    # Per-connection tuning (WAL lets readers run while a writer commits)
+    PRAGMAS = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-20000",       # ~20 MB page cache
+        "PRAGMA mmap_size=268435456",     # 256 MB memory-mapped reads
+        "PRAGMA temp_store=MEMORY",
+    ]
+    BUSY_TIMEOUT = 30
+    STATEMENT_CACHE = 256
+
     def __init__(self, db_path="lottery.db"):
         self.db_path = db_path
         self.lock = threading.Lock()
+        self._local = threading.local()
+        self._count_cache = {}
         self._init_db()
 
     # -------------------------------------------------------
-    # CONNECT
+    # CONNECT (ONE POOLED CONNECTION PER THREAD / WORKER)
     # -------------------------------------------------------
     def connect(self):
-        return sqlite3.connect(self.db_path)
+        local = self._local
+        conn = getattr(local, "conn", None)
+
+        # a forked worker must never reuse its parent's handle
+        if conn is None or local.pid != os.getpid():
+            conn = self._open()
+            local.conn = conn
+            local.pid = os.getpid()
+
+        return conn
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.BUSY_TIMEOUT,
+            cached_statements=self.STATEMENT_CACHE
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
 
     # -------------------------------------------------------
     # INIT DATABASE
     # -------------------------------------------------------
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             c = conn.cursor()
 
+            # workers starting together migrate one after the other
+            c.execute("BEGIN IMMEDIATE")
+
             c.execute("""
                 CREATE TABLE IF NOT EXISTS lottery_data (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -39,119 +135,379 @@ class DatabaseManager:
                     last3 TEXT,
                     last2_ab TEXT,
                     last2_bc TEXT,
-                    last2_ac TEXT
+                    last2_ac TEXT,
+
+                    draw_ts TEXT,
+                    data_version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+            # last write version per lottery / time slot ('*', '*' = global)
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    lottery_name TEXT NOT NULL,
+                    time_col TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    updated_at REAL,
+                    PRIMARY KEY (lottery_name, time_col)
+                )
+            """)
+            self._migrate_version_time(c)
+            c.execute(
+                "INSERT OR IGNORE INTO data_versions (lottery_name, time_col, version) VALUES ('*', '*', 0)"
+            )
+
+            # finished AI answers (or the error of the last attempt),
+            # keyed by prompt hash + data version, grouped by time filter
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS ai_results (
+                    cache_key TEXT PRIMARY KEY,
+                    data_version INTEGER NOT NULL,
+                    output TEXT,
+                    created_at REAL NOT NULL,
+                    error TEXT,
+                    filter_key TEXT
+                )
+            """)
+            self._migrate_ai_results(c)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_ai_filter ON ai_results(filter_key, created_at)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_ai_created ON ai_results(created_at)")
+
+            # precomputed engine output per time-slot filter (JSON),
+            # valid for one data version under one code release
+            self._migrate_snapshot_release(c)
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_snapshots (
+                    filter_key TEXT NOT NULL,
+                    engine TEXT NOT NULL,
+                    data_version INTEGER NOT NULL,
+                    release TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (filter_key, engine)
+                )
+            """)
+
+            # engine results shared by all workers (LRU by accessed_at)
+            self._migrate_result_release(c)
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    engine TEXT NOT NULL,
+                    release TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_result_accessed ON result_cache(accessed_at)")
+
+            # single-flight leases: one computing caller per key, any worker
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    cache_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
                 )
             """)
 
+            self._migrate_draw_ts(c)
+            self._migrate_unique_draws(c)
+            self._migrate_data_version(c)
+
             # Indexes for faster filtering
             c.execute("CREATE INDEX IF NOT EXISTS idx_date ON lottery_data(date_col)")
             c.execute("CREATE INDEX IF NOT EXISTS idx_time ON lottery_data(time_col)")
             c.execute("CREATE INDEX IF NOT EXISTS idx_lottery ON lottery_data(lottery_name)")
 
-            conn.commit()
+            # Indexes for chronological reads (ORDER BY draw_ts ... LIMIT)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_draw_ts ON lottery_data(draw_ts, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_time_draw_ts ON lottery_data(time_col, draw_ts, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_lottery_draw_ts ON lottery_data(lottery_name, draw_ts, id)")
+
+            # Change feed (rows written after version N)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_data_version ON lottery_data(data_version, id)")
 
     # -------------------------------------------------------
-    # STORE LOTTERY DATA
+    # MIGRATION: WRITE VERSION STAMP
     # -------------------------------------------------------
-    def store_lottery_data(self, rows):
-        with self.lock:  # thread-safe writes
-            conn = self.connect()
-            cursor = conn.cursor()
-
-            for row in rows:
-                cursor.execute("""
-                    INSERT INTO lottery_data (
-                        lottery_name, date_col, time_col, winner,
-                        aaa_first, aa_second, a_third, b_fourth, c_last,
-                        last4, last3, last2_ab, last2_bc, last2_ac
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row.get("lottery_name"),
-                    row.get("date"),
-                    row.get("time"),
-                    row.get("winner"),
-                    row.get("aaa_first"),
-                    row.get("aa_second"),
-                    row.get("a_third"),
-                    row.get("b_fourth"),
-                    row.get("c_last"),
-                    row.get("last4"),
-                    row.get("last3"),
-                    row.get("ab"),       # safe
-                    row.get("bc"),
-                    row.get("ac")
-                ))
-
-            conn.commit()
-            conn.close()
+    def _migrate_data_version(self, c):
+        cols = [r[1] for r in c.execute("PRAGMA table_info(lottery_data)")]
+        if "data_version" not in cols:
+            c.execute(
+                "ALTER TABLE lottery_data ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0"
+            )
 
     # -------------------------------------------------------
-    # SORT HELPERS
-    # -------------------------------------------------------
-    DATE_SORT = """
-        (
-            substr(date_col, -4) || '-' ||
-            CASE
-                WHEN date_col LIKE '%January%' THEN '01'
-                WHEN date_col LIKE '%February%' THEN '02'
-                WHEN date_col LIKE '%March%' THEN '03'
-                WHEN date_col LIKE '%April%' THEN '04'
-                WHEN date_col LIKE '%May%' THEN '05'
-                WHEN date_col LIKE '%June%' THEN '06'
-                WHEN date_col LIKE '%July%' THEN '07'
-                WHEN date_col LIKE '%August%' THEN '08'
-                WHEN date_col LIKE '%September%' THEN '09'
-                WHEN date_col LIKE '%October%' THEN '10'
-                WHEN date_col LIKE '%November%' THEN '11'
-                WHEN date_col LIKE '%December%' THEN '12'
-                ELSE '00'
-            END || '-' ||
-            printf('%02d', CAST(substr(date_col, 1, instr(date_col, ' ') - 1) AS INTEGER))
+    # MIGRATION: WRITE TIME PER VERSION (HTTP Last-Modified)
+    # -------------------------------------------------------
+    def _migrate_version_time(self, c):
+        cols = [r[1] for r in c.execute("PRAGMA table_info(data_versions)")]
+        if "updated_at" not in cols:
+            c.execute("ALTER TABLE data_versions ADD COLUMN updated_at REAL")
+
+    # -------------------------------------------------------
+    # MIGRATION: AI JOB ERRORS + TIME FILTER
+    # -------------------------------------------------------
+    def _migrate_ai_results(self, c):
+        cols = [r[1] for r in c.execute("PRAGMA table_info(ai_results)")]
+        if "error" not in cols:
+            c.execute("ALTER TABLE ai_results ADD COLUMN error TEXT")
+        if "filter_key" not in cols:
+            c.execute("ALTER TABLE ai_results ADD COLUMN filter_key TEXT")
+
+    # -------------------------------------------------------
+    # MIGRATION: RELEASE-STAMPED SNAPSHOTS
+    # -------------------------------------------------------
+    def _migrate_snapshot_release(self, c):
+        # unstamped snapshots may come from other code: drop, they rebuild
+        cols = [r[1] for r in c.execute("PRAGMA table_info(analytics_snapshots)")]
+        if cols and "release" not in cols:
+            c.execute("DROP TABLE analytics_snapshots")
+
+    def _migrate_result_release(self, c):
+        cols = [r[1] for r in c.execute("PRAGMA table_info(result_cache)")]
+        if cols and "release" not in cols:
+            c.execute("DROP TABLE result_cache")
+
+    # -------------------------------------------------------
+    # MIGRATION: ONE ROW PER DRAW
+    # -------------------------------------------------------
+    def _migrate_unique_draws(self, c):
+        c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_draw'"
         )
-    """
+        if c.fetchone():
+            return
+
+        # drop re-imported copies, keep the first stored row of each draw
+        # (a no-op on a second run)
+        c.execute("""
+            DELETE FROM lottery_data
+            WHERE lottery_name IS NOT NULL
+              AND date_col IS NOT NULL
+              AND time_col IS NOT NULL
+              AND id NOT IN (
+                SELECT MIN(id) FROM lottery_data
+                GROUP BY lottery_name, date_col, time_col
+              )
+        """)
+        c.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_draw
+            ON lottery_data(lottery_name, date_col, time_col)
+        """)
 
-    TIME_SORT = """
-        CASE time_col
-            WHEN '12.30 AM' THEN 1
-            WHEN '1 PM' THEN 2
-            WHEN '3 PM' THEN 3
-            WHEN '5.30 PM' THEN 4
-            WHEN '6 PM' THEN 5
-            WHEN '7.30 PM' THEN 6
-            WHEN '8 PM' THEN 7
-            WHEN '9 PM' THEN 8
-            WHEN '10 PM' THEN 9
-            ELSE 8
-        END
-    """
+    # -------------------------------------------------------
+    # MIGRATION: STORED SORT KEY
+    # -------------------------------------------------------
+    def _migrate_draw_ts(self, c):
+        cols = [r[1] for r in c.execute("PRAGMA table_info(lottery_data)")]
+        if "draw_ts" not in cols:
+            c.execute("ALTER TABLE lottery_data ADD COLUMN draw_ts TEXT")
+
+        c.execute("SELECT id, date_col, time_col FROM lottery_data WHERE draw_ts IS NULL")
+        pending = c.fetchall()
+        if pending:
+            c.executemany(
+                "UPDATE lottery_data SET draw_ts=? WHERE id=?",
+                [(draw_sort_key(d, t), i) for i, d, t in pending]
+            )
+
+    # -------------------------------------------------------
+    # STORE LOTTERY DATA (BULK, IDEMPOTENT UPSERT)
+    # -------------------------------------------------------
+    DATA_COLUMNS = [
+        "winner",
+        "aaa_first", "aa_second", "a_third", "b_fourth", "c_last",
+        "last4", "last3", "last2_ab", "last2_bc", "last2_ac",
+        "draw_ts"
+    ]
+    CHUNK_SIZE = 300
+
+    @staticmethod
+    def _row_values(row):
+        return (
+            row.get("winner"),
+            row.get("aaa_first"),
+            row.get("aa_second"),
+            row.get("a_third"),
+            row.get("b_fourth"),
+            row.get("c_last"),
+            row.get("last4"),
+            row.get("last3"),
+            row.get("ab"),       # safe
+            row.get("bc"),
+            row.get("ac"),
+            draw_sort_key(row.get("date"), row.get("time"))
+        )
+
+    def store_lottery_data(self, rows, chunk_size=None):
+        """
+        Insert new draws, update changed ones, skip identical ones.
+        Key = (lottery_name, date_col, time_col); a row missing any of
+        them is skipped (NULLs never conflict, so every re-import would
+        store it again).
+        Returns {"inserted": n, "updated": n, "skipped": n}.
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        stats = {"inserted": 0, "updated": 0, "skipped": 0}
+
+        stamped = self.DATA_COLUMNS + ["data_version"]
+        cols = ", ".join(stamped)
+        marks = ", ".join(["?"] * (3 + len(stamped)))
+        updates = ", ".join(f"{col}=excluded.{col}" for col in stamped)
+
+        upsert = f"""
+            INSERT INTO lottery_data (lottery_name, date_col, time_col, {cols})
+            VALUES ({marks})
+            ON CONFLICT (lottery_name, date_col, time_col) DO UPDATE SET {updates}
+        """
+
+        rows = list(rows)
+
+        with self.lock:  # thread-safe writes
+            conn = self.connect()
+
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+
+                with conn:  # one transaction per chunk
+                    c = conn.cursor()
+                    c.execute("BEGIN IMMEDIATE")  # other workers wait, no lock upgrade race
+
+                    known = self._existing_values(c, chunk)
+                    pending = []
+
+                    for row in chunk:
+                        key = (row.get("lottery_name"), row.get("date"), row.get("time"))
+                        if None in key:
+                            stats["skipped"] += 1
+                            continue
+
+                        values = self._row_values(row)
+                        if key in known:
+                            if known[key] == values:
+                                stats["skipped"] += 1
+                                continue
+                            stats["updated"] += 1
+                        else:
+                            stats["inserted"] += 1
+
+                        known[key] = values
+                        pending.append(key + values)
+
+                    if pending:
+                        version = self._bump_version(c, {(p[0], p[2]) for p in pending})
+                        c.executemany(upsert, [p + (version,) for p in pending])
+
+            if stats["inserted"]:
+                self.clear_count_cache()
+
+        return stats
+
+    def _bump_version(self, c, scopes):
+        """
+        Next global version, also recorded for every (lottery, time)
+        touched. Runs inside the writing transaction.
+        """
+        now = time.time()
+        c.execute("""
+            UPDATE data_versions SET version = version + 1, updated_at = ?
+            WHERE lottery_name='*' AND time_col='*'
+        """, [now])
+        c.execute("SELECT version FROM data_versions WHERE lottery_name='*' AND time_col='*'")
+        version = c.fetchone()[0]
+
+        c.executemany("""
+            INSERT INTO data_versions (lottery_name, time_col, version, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (lottery_name, time_col) DO UPDATE SET
+                version=excluded.version, updated_at=excluded.updated_at
+        """, [
+            (name, slot, version, now) for name, slot in scopes
+            if name is not None and slot is not None
+        ])
+        return version
+
+    def _existing_values(self, c, chunk):
+        keys = {
+            (r.get("lottery_name"), r.get("date"), r.get("time"))
+            for r in chunk
+        }
+        keys = [k for k in keys if None not in k]
+        if not keys:
+            return {}
+
+        pairs = ", ".join(["(?, ?, ?)"] * len(keys))
+        c.execute(f"""
+            SELECT lottery_name, date_col, time_col, {", ".join(self.DATA_COLUMNS)}
+            FROM lottery_data
+            WHERE (lottery_name, date_col, time_col) IN (VALUES {pairs})
+        """, [v for k in keys for v in k])
+
+        return {tuple(r[:3]): tuple(r[3:]) for r in c.fetchall()}
 
     # -------------------------------------------------------
     # FILTER LISTS
     # -------------------------------------------------------
     def get_lottery_filters(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             c = conn.cursor()
 
             c.execute("SELECT DISTINCT lottery_name FROM lottery_data ORDER BY lottery_name")
             names = [x[0] for x in c.fetchall()]
 
-            c.execute(f"SELECT DISTINCT date_col FROM lottery_data ORDER BY {self.DATE_SORT} ASC")
+            c.execute("""
+                SELECT date_col FROM lottery_data
+                GROUP BY date_col
+                ORDER BY MIN(substr(draw_ts, 1, 10)) ASC
+            """)
             dates = [x[0] for x in c.fetchall()]
 
-            c.execute(f"SELECT DISTINCT time_col FROM lottery_data ORDER BY {self.TIME_SORT} ASC")
+            c.execute("""
+                SELECT time_col FROM lottery_data
+                GROUP BY time_col
+                ORDER BY MIN(substr(draw_ts, 12)) ASC
+            """)
             times = [x[0] for x in c.fetchall()]
 
         return {"lottery_names": names, "dates": dates, "times": times}
 
     # -------------------------------------------------------
-    # PAGINATED VIEWER
+    # PAGE CURSORS  ("draw_ts|id" -> url-safe token)
     # -------------------------------------------------------
-    def get_lottery_rows(self, lottery_name, date_col, time_col, page, page_size=3):
+    @staticmethod
+    def encode_cursor(row):
+        raw = f"{row['draw_ts']}|{row['id']}".encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(token):
+        try:
+            raw = base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+            draw_ts, row_id = raw.rsplit("|", 1)
+            return draw_ts, int(row_id)
+        except Exception:
+            return None
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    # -------------------------------------------------------
+    # PAGINATED VIEWER (KEYSET)
+    # -------------------------------------------------------
+    def get_lottery_rows(self, lottery_name, date_col, time_col, page,
+                         page_size=3, after=None, before=None):
+        """
+        Newest-first pages. `after` / `before` are cursor tokens from a
+        previous page (see nav["next"] / nav["prev"]); without one the
+        page number falls back to OFFSET.
+        Returns (rows, total, nav).
+        """
+        after = self.decode_cursor(after) if after else None
+        before = self.decode_cursor(before) if before else None
+
+        with self.connect() as conn:
             c = conn.cursor()
+            c.row_factory = sqlite3.Row
 
             base = "FROM lottery_data WHERE 1=1"
             params = []
@@ -169,30 +525,86 @@ class DatabaseManager:
                 base += f" AND time_col IN ({placeholders})"
                 params.extend(time_col)
 
-            query = f"""
-                SELECT * {base}
-                ORDER BY {self.DATE_SORT} DESC, {self.TIME_SORT} DESC
-                LIMIT ? OFFSET ?
-            """
+            if after:
+                # older rows than the last row shown
+                query = f"""
+                    SELECT * {base} AND (draw_ts, id) < (?, ?)
+                    ORDER BY draw_ts DESC, id DESC
+                    LIMIT ?
+                """
+                c.execute(query, params + list(after) + [page_size + 1])
+                rows = c.fetchall()
+                has_newer = True
+                has_older = len(rows) > page_size
+                rows = rows[:page_size]
+
+            elif before:
+                # newer rows than the first row shown, walked backwards
+                query = f"""
+                    SELECT * {base} AND (draw_ts, id) > (?, ?)
+                    ORDER BY draw_ts ASC, id ASC
+                    LIMIT ?
+                """
+                c.execute(query, params + list(before) + [page_size + 1])
+                rows = c.fetchall()
+                has_newer = len(rows) > page_size
+                has_older = True
+                rows = rows[:page_size][::-1]
+
+            else:
+                query = f"""
+                    SELECT * {base}
+                    ORDER BY draw_ts DESC, id DESC
+                    LIMIT ? OFFSET ?
+                """
+                offset = (page - 1) * page_size
+                c.execute(query, params + [page_size + 1, offset])
+                rows = c.fetchall()
+                has_newer = offset > 0
+                has_older = len(rows) > page_size
+                rows = rows[:page_size]
 
-            offset = (page - 1) * page_size
+            total = self._cached_count(c, base, params)
 
-            c.execute(query, params + [page_size, offset])
-            rows = c.fetchall()
+        nav = {
+            "next": self.encode_cursor(rows[-1]) if rows and has_older else None,
+            "prev": self.encode_cursor(rows[0]) if rows and has_newer else None,
+        }
+
+        return rows, total, nav
+
+    # -------------------------------------------------------
+    # ROW COUNT CACHE
+    # -------------------------------------------------------
+    def _cached_count(self, c, base, params):
+        # ids only grow, so MAX(id) changes whenever any worker inserts
+        c.execute("SELECT MAX(id) FROM lottery_data")
+        stamp = c.fetchone()[0]
 
-            c.execute("SELECT COUNT(*) " + base, params)
-            total = c.fetchone()[0]
+        key = (base, tuple(params))
+        hit = self._count_cache.get(key)
+        if hit and hit[0] == stamp:
+            return hit[1]
 
-        return rows, total
+        c.execute("SELECT COUNT(*) " + base, params)
+        total = c.fetchone()[0]
+        self._count_cache[key] = (stamp, total)
+        return total
+
+    def clear_count_cache(self):
+        self._count_cache.clear()
 
     # -------------------------------------------------------
     # FULL HISTORY (FOR PREDICTION ENGINE)
     # -------------------------------------------------------
-    def get_all_history(self, time_filter=None):
-
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def get_all_history(self, time_filter=None, last_n=None, since=None):
+        """
+        Draws oldest first. last_n: only the newest N (after filtering);
+        since: only draws on or after that day ("YYYY-MM-DD").
+        """
+        with self.connect() as conn:
             c = conn.cursor()
+            c.row_factory = sqlite3.Row
 
             base = "FROM lottery_data WHERE 1=1"
             params = []
@@ -202,10 +614,25 @@ class DatabaseManager:
                 base += f" AND time_col IN ({placeholders})"
                 params.extend(time_filter)
 
-            q = f"""
-                SELECT * {base}
-                ORDER BY {self.DATE_SORT} ASC, {self.TIME_SORT} ASC
-            """
+            if since:
+                base += " AND draw_ts >= ?"
+                params.append(since)
+
+            if last_n:
+                q = f"""
+                    SELECT * FROM (
+                        SELECT * {base}
+                        ORDER BY draw_ts DESC, id DESC
+                        LIMIT ?
+                    )
+                    ORDER BY draw_ts ASC, id ASC
+                """
+                params.append(last_n)
+            else:
+                q = f"""
+                    SELECT * {base}
+                    ORDER BY draw_ts ASC, id ASC
+                """
 
             c.execute(q, params)
             rows = c.fetchall()
@@ -216,30 +643,282 @@ class DatabaseManager:
 
             return rows
 
+    # -------------------------------------------------------
+    # DATA VERSION + CHANGE FEED
+    # -------------------------------------------------------
+    def get_data_version(self, time_filter=None, lottery_name=None):
+        """
+        Version of the last write that touched the given scope
+        (0 = never written). No arguments -> global version.
+        time_filter may be one slot or a list of slots.
+        """
+        if isinstance(time_filter, str):
+            time_filter = [time_filter]
+
+        if not time_filter and not lottery_name:
+            q = "SELECT version FROM data_versions WHERE lottery_name='*' AND time_col='*'"
+            params = []
+        else:
+            q = "SELECT MAX(version) FROM data_versions WHERE lottery_name != '*'"
+            params = []
+
+            if lottery_name:
+                q += " AND lottery_name=?"
+                params.append(lottery_name)
+
+            if time_filter:
+                placeholders = ",".join(["?"] * len(time_filter))
+                q += f" AND time_col IN ({placeholders})"
+                params.extend(time_filter)
+
+        with self.connect() as conn:
+            row = conn.execute(q, params).fetchone()
+        return (row[0] if row else 0) or 0
+
+    def get_data_stamp(self):
+        """(global version, unix time of that write or None if unknown)"""
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT version, updated_at FROM data_versions
+                WHERE lottery_name='*' AND time_col='*'
+            """).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def get_changes_since(self, version, time_filter=None):
+        """
+        Rows inserted or updated after `version`, in write order.
+        Returns (rows, current_version).
+        """
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.row_factory = sqlite3.Row
+
+            # read the version first so nothing written after it is lost
+            current = self.get_data_version()
+
+            base = "FROM lottery_data WHERE data_version > ? AND data_version <= ?"
+            params = [version or 0, current]
+
+            if time_filter:
+                placeholders = ",".join(["?"] * len(time_filter))
+                base += f" AND time_col IN ({placeholders})"
+                params.extend(time_filter)
+
+            c.execute(f"SELECT * {base} ORDER BY data_version ASC, id ASC", params)
+            return c.fetchall(), current
+
+    # -------------------------------------------------------
+    # AI RESULT CACHE
+    # -------------------------------------------------------
+    def get_ai_result(self, cache_key):
+        """Finished answer for the key (failed attempts excluded), else None."""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM ai_results WHERE cache_key=? AND error IS NULL",
+                [cache_key]
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_ai_status(self, cache_key):
+        """(output, error) of the stored answer / failed attempt, else None."""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT output, error FROM ai_results WHERE cache_key=?", [cache_key]
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def get_latest_ai_result(self, filter_key):
+        """Newest finished answer for the same time filter, else None."""
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT output FROM ai_results
+                WHERE filter_key=? AND error IS NULL
+                ORDER BY created_at DESC LIMIT 1
+            """, [filter_key]).fetchone()
+        return row[0] if row else None
+
+    AI_KEEP = 20    # answers kept per time filter
+
+    def store_ai_result(self, cache_key, data_version, output, filter_key, error=None):
+        """Store an answer (or, with error=, a failed attempt), then prune."""
+        with self.lock, self.connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO ai_results
+                    (cache_key, data_version, output, created_at, error, filter_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [cache_key, data_version, output, time.time(), error, filter_key])
+
+            # every data version adds a row: keep the newest per filter
+            conn.execute("""
+                DELETE FROM ai_results
+                WHERE filter_key=? AND cache_key NOT IN (
+                    SELECT cache_key FROM ai_results WHERE filter_key=?
+                    ORDER BY created_at DESC LIMIT ?
+                )
+            """, [filter_key, filter_key, self.AI_KEEP])
+
+    def store_ai_error(self, cache_key, data_version, error, filter_key):
+        """Record a failed attempt so every worker's poll can report it."""
+        self.store_ai_result(cache_key, data_version, None, filter_key, error=error)
+
+    def clear_ai_error(self, cache_key):
+        """Forget a failed attempt before retrying it (writes only if one is stored)."""
+        with self.connect() as conn:
+            failed = conn.execute(
+                "SELECT 1 FROM ai_results WHERE cache_key=? AND error IS NOT NULL", [cache_key]
+            ).fetchone()
+        if failed is None:
+            return
+
+        with self.lock, self.connect() as conn:
+            conn.execute(
+                "DELETE FROM ai_results WHERE cache_key=? AND error IS NOT NULL", [cache_key]
+            )
+
+    # -------------------------------------------------------
+    # PRECOMPUTED ANALYTICS SNAPSHOTS
+    # -------------------------------------------------------
+    def get_analytics_snapshot(self, filter_key, engine, data_version, release):
+        """Stored payload for exactly this data version and release, else None."""
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT payload FROM analytics_snapshots
+                WHERE filter_key=? AND engine=? AND data_version=? AND release=?
+            """, [filter_key, engine, data_version, release]).fetchone()
+        return row[0] if row else None
+
+    def get_analytics_versions(self):
+        """{(filter_key, engine): (data_version, release)} of every stored snapshot."""
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT filter_key, engine, data_version, release FROM analytics_snapshots"
+            ).fetchall()
+        return {(key, engine): (version, release) for key, engine, version, release in rows}
+
+    def store_analytics_snapshots(self, filter_key, data_version, release, payloads):
+        """payloads: {engine: json text}; replaces older versions / releases."""
+        now = time.time()
+        with self.lock, self.connect() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO analytics_snapshots
+                    (filter_key, engine, data_version, release, payload, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (filter_key, engine, data_version, release, payload, now)
+                for engine, payload in payloads.items()
+            ])
+
+    # -------------------------------------------------------
+    # SHARED RESULT CACHE + SINGLE-FLIGHT LOCKS
+    # -------------------------------------------------------
+    def get_cached_result(self, cache_key, ttl, touch_after=60):
+        """
+        Payload stored less than `ttl` seconds ago, else None. A hit
+        marks the entry used only when its accessed_at is more than
+        `touch_after` seconds old: most hits stay read-only.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT payload, accessed_at FROM result_cache
+                WHERE cache_key=? AND created_at > ?
+            """, [cache_key, now - ttl]).fetchone()
+
+        if row is None:
+            return None
+
+        payload, accessed_at = row
+        if accessed_at <= now - touch_after:
+            with self.lock, self.connect() as conn:
+                conn.execute("""
+                    UPDATE result_cache SET accessed_at=?
+                    WHERE cache_key=? AND accessed_at <= ?
+                """, [now, cache_key, now - touch_after])
+        return payload
+
+    def store_cached_result(self, cache_key, engine, release, payload, max_bytes, ttl):
+        """
+        Store one payload, then drop expired entries and the least
+        recently used ones until the cache fits in max_bytes.
+        """
+        now = time.time()
+        with self.lock, self.connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO result_cache
+                    (cache_key, engine, release, payload, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [cache_key, engine, release, payload, len(payload), now, now])
+
+            conn.execute("DELETE FROM result_cache WHERE created_at <= ?", [now - ttl])
+            conn.execute("""
+                DELETE FROM result_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               SUM(size) OVER (ORDER BY accessed_at DESC, cache_key) AS used
+                        FROM result_cache
+                    ) WHERE used > ?
+                )
+            """, [max_bytes])
+
+    def clear_cached_results(self, keep_release=None):
+        """Drop cached results (all, or those of every other release)."""
+        with self.lock, self.connect() as conn:
+            if keep_release is None:
+                conn.execute("DELETE FROM result_cache")
+            else:
+                conn.execute("DELETE FROM result_cache WHERE release != ?", [keep_release])
+
+    def acquire_cache_lock(self, cache_key, owner, lease):
+        """True if `owner` now holds the key (expired leases are taken over)."""
+        now = time.time()
+        with self.lock, self.connect() as conn:
+            conn.execute(
+                "DELETE FROM cache_locks WHERE cache_key=? AND expires_at < ?", [cache_key, now]
+            )
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO cache_locks (cache_key, owner, expires_at) VALUES (?, ?, ?)",
+                [cache_key, owner, now + lease]
+            )
+            return cur.rowcount == 1
+
+    def release_cache_lock(self, cache_key, owner):
+        with self.lock, self.connect() as conn:
+            conn.execute(
+                "DELETE FROM cache_locks WHERE cache_key=? AND owner=?", [cache_key, owner]
+            )
+
     # -------------------------------------------------------
     # LAST 4 RESULTS BLOCK
     # -------------------------------------------------------
-    def get_last4(self, time_filter=None):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def get_last4(self, time_filter=None, limit=4):
+        """
+        Newest `limit` draws for one slot, a list of slots, or all.
+        (history_store.ColumnStore.latest() serves this from memory.)
+        """
+        with self.connect() as conn:
             c = conn.cursor()
+            c.row_factory = sqlite3.Row
 
             # Handle "All" case
-            if time_filter in (None, "", "ALL"):
-                q = f"""
+            if time_filter in (None, "", "ALL") or time_filter == []:
+                q = """
                     SELECT * FROM lottery_data
-                    ORDER BY {self.DATE_SORT} DESC, {self.TIME_SORT} DESC
-                    LIMIT 4
+                    ORDER BY draw_ts DESC, id DESC
+                    LIMIT ?
                 """
-                c.execute(q)
+                c.execute(q, [limit])
                 return c.fetchall()
 
-            # Filter by specific time
+            if isinstance(time_filter, str):
+                time_filter = [time_filter]
+
+            # Filter by specific time(s)
+            placeholders = ",".join(["?"] * len(time_filter))
             q = f"""
                 SELECT * FROM lottery_data
-                WHERE time_col=?
-                ORDER BY {self.DATE_SORT} DESC
-                LIMIT 4
+                WHERE time_col IN ({placeholders})
+                ORDER BY draw_ts DESC, id DESC
+                LIMIT ?
             """
-            c.execute(q, [time_filter])
+            c.execute(q, list(time_filter) + [limit])
             return c.fetchall()
@@ -0,0 +1,63 @@
+# digit_matrix.py
+# ------------------------------------------------------
+#  ONE UINT8 DIGIT MATRIX FOR ALL EIGHT CATEGORIES
+# ------------------------------------------------------
+
+import numpy as np
+
+from history_store import DIGIT_WIDTHS
+
+
+# category -> winner digits it is cut from (lottery_importer /
+# save_record: AB = 3rd + 4th, AC = 3rd + last, ...)
+WINNER_SLICES = {
+    "LAST4": slice(1, 5),
+    "LAST3": slice(2, 5),
+    "AB": slice(2, 4),
+    "BC": slice(3, 5),
+    "AC": slice(2, 5, 2),
+    "A": slice(2, 3),
+    "B": slice(3, 4),
+    "C": slice(4, 5),
+}
+
+
+def rows_matrix(norm, digits):
+    """pattern_engine.normalize() rows -> (N, digits) uint8 matrix."""
+    return np.array(norm, dtype=np.uint8).reshape(-1, digits)
+
+
+def _stack(columns, width):
+    if not columns:
+        return np.zeros((0, width), dtype=np.uint8)
+    return np.stack([np.frombuffer(c, dtype=np.uint8) for c in columns], axis=1)
+
+
+class DigitMatrix:
+    """
+    winners: (N, 5) uint8, one row per draw of a history_store.ColumnView.
+
+    Each category is a column slice (a view, no copy) of the winner
+    matrix when its stored digits are exactly that projection for every
+    row, as the importers write them. Otherwise (missing values, winners
+    that are not 5 digits) the category's own parsed digits are used, so
+    the result always equals ColumnView.digit_rows(key).
+    """
+
+    def __init__(self, view):
+        self.winners = _stack(view.winner_columns(), 5)
+        row_pos = np.asarray(view.positions())
+
+        self.categories = {}
+        for key, width in DIGIT_WIDTHS.items():
+            own = _stack(view.digit_columns(key), width)
+            projected = self.winners[:, WINNER_SLICES[key]]
+
+            same_rows = np.array_equal(np.asarray(view.positions(key)), row_pos)
+            if same_rows and np.array_equal(own, projected):
+                self.categories[key] = projected
+            else:
+                self.categories[key] = own
+
+    def __getitem__(self, key):
+        return self.categories[key]
@@ -0,0 +1,97 @@
+# engine_pool.py
+# ------------------------------------------------------
+#  FAN-OUT OF THE CPU-BOUND ANALYSIS ENGINES
+# ------------------------------------------------------
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def available_cpus():
+    """Cores this process may run on (a container's share, not the host's)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:       # macOS / Windows
+        return os.cpu_count() or 1
+
+
+def pool_from_env(name="ENGINE_WORKERS"):
+    """
+    EnginePool when $ENGINE_WORKERS asks for one ("auto" = available
+    cores, N = N processes), else None: engines run inline (default).
+    """
+    value = os.getenv(name, "").strip().lower()
+    if value == "auto":
+        workers = available_cpus()
+    elif value.isdigit():
+        workers = int(value)
+    else:
+        return None
+    return EnginePool(workers) if workers > 1 else None
+
+
+def run_tasks(tasks, pool=None):
+    """[(fn, *args), ...] -> [fn(*args), ...] on pool, or inline."""
+    if pool is not None:
+        return pool.run(tasks)
+    return [fn(*args) for fn, *args in tasks]
+
+
+class EnginePool:
+    """
+    Process pool for independent engine tasks (one category, one time
+    slot filter, ...). Tasks get read-only digit matrices and return
+    plain results; run() gathers them in submission order, so the output
+    never depends on which worker finished first.
+
+    One core (or max_workers=1): tasks run inline, same results. The
+    pool is started lazily per process (gunicorn forks after import)
+    with "spawn", so workers never inherit the parent's threads / locks.
+    Spawned workers import the main module: keep its import free of
+    side effects (app.py starts its services in create_app()).
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or available_cpus()
+        self.lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    @property
+    def parallel(self):
+        return self.max_workers > 1
+
+    def _executor(self):
+        with self.lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def run(self, tasks):
+        tasks = list(tasks)
+        if not self.parallel or len(tasks) < 2:
+            return run_tasks(tasks)
+
+        try:
+            pool = self._executor()
+            futures = [pool.submit(fn, *args) for fn, *args in tasks]
+            return [f.result() for f in futures]
+
+        except BrokenProcessPool:
+            # a worker died (OOM / killed): start over next time, answer now
+            self.shutdown()
+            return run_tasks(tasks)
+
+    def shutdown(self):
+        with self.lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pid = None
@@ -0,0 +1,436 @@
+# history_store.py
+# ------------------------------------------------------
+#  SHARED HISTORY VIEWS FOR EVERY ANALYTICS STAGE
+# ------------------------------------------------------
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque, namedtuple
+from itertools import islice
+
+
+# view name -> lottery_data column
+COLUMN_VIEWS = {
+    "date_col": "date_col",
+    "time_col": "time_col",
+    "Winner": "winner",
+    "LAST4": "last4",
+    "LAST3": "last3",
+    "AB": "last2_ab",
+    "BC": "last2_bc",
+    "AC": "last2_ac",
+    "A": "a_third",
+    "B": "b_fourth",
+    "C": "c_last",
+}
+
+
+class HistoryWindow(namedtuple("HistoryWindow", "last_n since")):
+    """
+    How far back an engine looks: the newest last_n draws and / or the
+    draws on or after `since` ("YYYY-MM-DD"). Neither = full history.
+    Hashable, so it doubles as part of a cache key.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, last_n=None, since=None):
+        return super().__new__(cls, last_n or None, since or None)
+
+    @property
+    def full(self):
+        return self.last_n is None and self.since is None
+
+
+FULL_HISTORY = HistoryWindow()
+
+
+class HistorySnapshot:
+    """
+    One fetch of lottery_data (oldest first), walked once.
+
+    columns[view] -> non-empty values of that column, in draw order
+    ids[view]     -> lottery_data.id of each value in columns[view]
+    winners/times -> one entry per row (empty rows included)
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+        self.columns = {view: [] for view in COLUMN_VIEWS}
+        self.ids = {view: [] for view in COLUMN_VIEWS}
+        self.row_ids = []
+        self.winners = []
+        self.times = []
+
+        items = list(COLUMN_VIEWS.items())
+
+        for r in rows:
+            row_id = r["id"]
+            self.row_ids.append(row_id)
+            self.winners.append(r["winner"])
+            self.times.append(r["time_col"])
+
+            for view, col in items:
+                v = r[col]
+                if v:
+                    self.columns[view].append(v)
+                    self.ids[view].append(row_id)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ------------------------------------------------------
+    # VIEWS
+    # ------------------------------------------------------
+    def history(self):
+        """Same shape as app.get_history()."""
+        return {view: list(vals) for view, vals in self.columns.items()}
+
+
+# ======================================================
+#  PROCESS-WIDE COLUMNAR STORE
+# ======================================================
+# category -> (lottery_data column, digits kept) — same rule as
+# pattern_engine.normalize(): keep the last N digits, skip shorter values
+DIGIT_WIDTHS = {
+    "LAST4": 4,
+    "LAST3": 3,
+    "AB": 2,
+    "BC": 2,
+    "AC": 2,
+    "A": 1,
+    "B": 1,
+    "C": 1,
+}
+
+
+def parse_digits(value, width):
+    """"48B 1620", 4 -> [1, 6, 2, 0]  (None when too short / empty)."""
+    if not value:
+        return None
+    s = "".join(c for c in str(value) if c.isdigit())
+    if len(s) < width:
+        return None
+    return [int(x) for x in s[-width:]]
+
+
+def clean_winner_digits(value):
+    """Same digits as pattern_engine_find._clean_digits_str()."""
+    s = "".join(c for c in str(value) if c.isdigit()) or "00000"
+    return [int(x) for x in s.zfill(5)[-5:]]
+
+
+class GrowableColumns:
+    """
+    Named, equal-length arrays with spare capacity.
+
+    Appends write into pre-allocated slots and only swap in a bigger
+    array when full, so a memoryview handed out earlier is never
+    resized underneath its reader (zero-copy views, in-place append).
+    """
+
+    def __init__(self, spec, capacity=1024):
+        self.spec = spec                    # {name: array typecode}
+        self.n = 0
+        self.capacity = capacity
+        self.arrays = {
+            name: array(tc, [0]) * capacity for name, tc in spec.items()
+        }
+
+    def __len__(self):
+        return self.n
+
+    def append(self, values):
+        if self.n == self.capacity:
+            self._grow()
+        i = self.n
+        for name, v in zip(self.spec, values):
+            self.arrays[name][i] = v
+        self.n += 1
+
+    def _grow(self):
+        extra = self.capacity
+        for name, tc in self.spec.items():
+            bigger = array(tc, self.arrays[name])
+            bigger.extend(array(tc, [0]) * extra)
+            self.arrays[name] = bigger
+        self.capacity += extra
+
+    def view(self, name):
+        return memoryview(self.arrays[name])[:self.n]
+
+
+class _Partition:
+    """All rows, or the rows of one time slot."""
+
+    def __init__(self):
+        self.rows = GrowableColumns({
+            "pos": "l", "id": "q", "slot": "H", "date": "l",
+            "w0": "b", "w1": "b", "w2": "b", "w3": "b", "w4": "b",
+        })
+        self.digits = {
+            key: GrowableColumns(dict(
+                [("pos", "l")] + [(f"d{i}", "b") for i in range(width)]
+            ))
+            for key, width in DIGIT_WIDTHS.items()
+        }
+
+
+# newest draws kept in memory per slot (and overall) for latest panels
+RECENT_KEEP = 50
+
+
+class ColumnStore:
+    """
+    lottery_data as compact digit columns, oldest draw first.
+
+    Loaded once per worker, then kept current by sync() from the
+    database change feed (see DatabaseManager.get_changes_since). view(time_filter) returns
+    read-only, zero-copy column views for the pattern engines.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.n = 0
+        self.version = 0
+        self.last_id = 0
+        self.last_key = None
+        self.keys = []              # draw_ts per position (sorted)
+        self.slot_names = []
+        self.slot_codes = {}
+        self.date_names = []
+        self.date_codes = {}
+        self.all = _Partition()
+        self.slots = {}
+        self.recent_all = deque(maxlen=RECENT_KEEP)
+        self.recent = {}
+
+    # ------------------------------------------------------
+    # LOAD / APPEND
+    # ------------------------------------------------------
+    def load(self):
+        with self.lock:
+            self._reset()
+            self.version = self.db.get_data_version()
+            self._append_rows(self.db.get_all_history())
+        return self
+
+    def sync(self):
+        """
+        Apply the change feed since the last load / sync. New draws are
+        appended in place; an updated draw, or one that sorts before the
+        newest draw already held, triggers a full reload.
+        """
+        with self.lock:
+            if self.db.get_data_version() == self.version:
+                return self
+
+            rows, version = self.db.get_changes_since(self.version)
+
+            if any(r["id"] <= self.last_id for r in rows):
+                return self.load()
+
+            rows = sorted(rows, key=lambda r: (r["draw_ts"], r["id"]))
+            if rows and self.last_key and (rows[0]["draw_ts"], rows[0]["id"]) < self.last_key:
+                return self.load()
+
+            self._append_rows(rows)
+            self.version = version
+        return self
+
+    def _code(self, names, codes, value):
+        if value not in codes:
+            codes[value] = len(names)
+            names.append(value)
+        return codes[value]
+
+    def _append_rows(self, rows):
+        for r in rows:
+            pos = self.n
+            slot = self._code(self.slot_names, self.slot_codes, r["time_col"])
+            date = self._code(self.date_names, self.date_codes, r["date_col"])
+            row_values = [pos, r["id"], slot, date] + clean_winner_digits(r["winner"])
+
+            parsed = {}
+            for key, width in DIGIT_WIDTHS.items():
+                parsed[key] = parse_digits(r[COLUMN_VIEWS[key]], width)
+
+            part = self.slots.get(r["time_col"])
+            if part is None:
+                part = self.slots[r["time_col"]] = _Partition()
+
+            for target in (self.all, part):
+                target.rows.append(row_values)
+                for key, digits in parsed.items():
+                    if digits is not None:
+                        target.digits[key].append([pos] + digits)
+
+            row = dict(r)
+            self.recent_all.append(row)
+            self.recent.setdefault(r["time_col"], deque(maxlen=RECENT_KEEP)).append(row)
+
+            self.keys.append(r["draw_ts"])
+            self.n += 1
+            self.last_id = max(self.last_id, r["id"])
+            self.last_key = (r["draw_ts"], r["id"])
+
+    # ------------------------------------------------------
+    # LATEST DRAWS
+    # ------------------------------------------------------
+    def latest(self, time_filter=None, n=4):
+        """Newest-first draws for one slot, several slots, or all."""
+        if isinstance(time_filter, str):
+            time_filter = [time_filter]
+
+        if n > RECENT_KEEP:
+            return [dict(r) for r in self.db.get_last4(time_filter, limit=n)]
+
+        with self.lock:
+            if not time_filter:
+                pools = [self.recent_all]
+            else:
+                pools = [self.recent[t] for t in dict.fromkeys(time_filter) if t in self.recent]
+
+            newest = heapq.merge(
+                *(reversed(p) for p in pools),
+                key=lambda r: (r["draw_ts"], r["id"]),
+                reverse=True
+            )
+            return list(islice(newest, n))
+
+    def latest_panels(self, slots, n=4):
+        """{slot: latest n, ..., "COMBINED": latest n across all slots}."""
+        panels = {slot: self.latest(slot, n) for slot in slots}
+        panels["COMBINED"] = self.latest(slots, n)
+        return panels
+
+    # ------------------------------------------------------
+    # VIEWS
+    # ------------------------------------------------------
+    def view(self, time_filter=None, window=None):
+        """
+        Columns for a time-slot filter, optionally cut to a HistoryWindow
+        (zero-copy slices of the full history, which stays in memory).
+        """
+        window = window or FULL_HISTORY
+
+        with self.lock:
+            # positions follow draw order, so "since" is one bisect
+            min_pos = bisect_left(self.keys, window.since) if window.since else 0
+
+            if not time_filter:
+                parts = [self.all]
+            else:
+                parts = [self.slots[t] for t in dict.fromkeys(time_filter) if t in self.slots]
+
+            return ColumnView(self, parts, min_pos, window.last_n)
+
+
+class ColumnView:
+    """
+    Read-only snapshot of one time-slot filter.
+
+    Single partition (no filter / one slot): memoryviews straight onto
+    the store's arrays. Several slots: merged once by draw position.
+    min_pos / last_n cut the view to a window (slices, no copies).
+    """
+
+    def __init__(self, store, parts, min_pos=0, last_n=None):
+        self.slot_names = list(store.slot_names)
+        self.date_names = list(store.date_names)
+
+        def table(pick):
+            return self._merge([
+                self._cut({name: t.view(name) for name in t.spec}, min_pos)
+                for t in map(pick, parts)
+            ])
+
+        self._rows = table(lambda p: p.rows)
+        self._digits = {
+            key: table(lambda p, key=key: p.digits[key])
+            for key in DIGIT_WIDTHS
+        }
+
+        if last_n and len(self) > last_n:
+            first = self._rows["pos"][-last_n]
+            self._rows = self._cut(self._rows, first)
+            self._digits = {key: self._cut(t, first) for key, t in self._digits.items()}
+
+    @staticmethod
+    def _cut(table, min_pos):
+        """Every column from the first row with pos >= min_pos."""
+        if not min_pos or not table:
+            return table
+        start = bisect_left(table["pos"], min_pos)
+        return {name: col[start:] for name, col in table.items()}
+
+    @staticmethod
+    def _merge(tables):
+        if len(tables) == 1:
+            return tables[0]
+
+        if not tables:
+            return {}
+
+        order = sorted(
+            (pos, ti, i)
+            for ti, t in enumerate(tables)
+            for i, pos in enumerate(t["pos"])
+        )
+        return {
+            name: memoryview(array(col.format, [tables[ti][name][i] for _, ti, i in order]))
+            for name, col in tables[0].items()
+        }
+
+    def __len__(self):
+        return len(self._rows.get("pos", ()))
+
+    # ------------------------------------------------------
+    # PER-ROW
+    # ------------------------------------------------------
+    @property
+    def ids(self):
+        return self._rows.get("id", memoryview(array("q")))
+
+    def times(self):
+        return [self.slot_names[c] for c in self._rows.get("slot", ())]
+
+    def dates(self):
+        return [self.date_names[c] for c in self._rows.get("date", ())]
+
+    def winner_columns(self):
+        """5 digit columns of the cleaned winners (empty when no rows)."""
+        if not self._rows:
+            return []
+        return [self._rows[f"w{i}"] for i in range(5)]
+
+    def winner_strings(self):
+        """Cleaned 5-digit winners, e.g. "01620"."""
+        if not self._rows:
+            return []
+        cols = [self._rows[f"w{i}"] for i in range(5)]
+        return ["%d%d%d%d%d" % w for w in zip(*cols)]
+
+    # ------------------------------------------------------
+    # PER-CATEGORY DIGITS
+    # ------------------------------------------------------
+    def positions(self, key=None):
+        """Draw positions of the rows, or of the rows that have category key."""
+        table = self._digits[key] if key else self._rows
+        return table.get("pos", memoryview(array("l")))
+
+    def digit_columns(self, key):
+        """[col_A, col_B, ...] for a category — same as zip(*normalize(...))."""
+        table = self._digits[key]
+        return [table[f"d{i}"] for i in range(DIGIT_WIDTHS[key])] if table else []
+
+    def digit_rows(self, key):
+        """[[A, B, ...], ...] — same as normalize(values, digits)."""
+        return [list(r) for r in zip(*self.digit_columns(key))]
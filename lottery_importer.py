@@ -112,6 +112,11 @@ if __name__ == "__main__":
         lottery_name="Nagaland Dear 6 PM"
     )
 
-    db.store_lottery_data(rows)
+    stats = db.store_lottery_data(rows)
 
     print("🎉 Lottery Import Completed Successfully!")
+    print(
+        f"Inserted: {stats['inserted']}  "
+        f"Updated: {stats['updated']}  "
+        f"Skipped: {stats['skipped']}"
+    )
@@ -101,6 +101,11 @@ if __name__ == "__main__":
 
     rows = parse_lottery_json("lottery.json")
 
-    db.store_lottery_data(rows)
+    stats = db.store_lottery_data(rows)
 
     print("🎉 JSON Lottery Import Completed Successfully!")
+    print(
+        f"Inserted: {stats['inserted']}  "
+        f"Updated: {stats['updated']}  "
+        f"Skipped: {stats['skipped']}"
+    )
@@ -0,0 +1,118 @@
+# metrics.py
+# ------------------------------------------------------
+#  PER-STAGE TIMERS, SERVER-TIMING, PROMETHEUS TEXT
+# ------------------------------------------------------
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Series:
+    """
+    Count / sum of every observation plus the latest `window` values
+    for quantiles, so p95 follows what requests cost now, not at boot.
+    """
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {
+            q: values[min(int(q * len(values)), len(values) - 1)]
+            for q in QUANTILES
+        }
+
+
+class Metrics:
+    """
+    Summaries keyed by (metric name, label value), per worker process.
+    render() writes them in the Prometheus text format.
+    """
+
+    HELP = {
+        "lotapp_stage_seconds": ("stage", "Time spent in one stage of a request."),
+        "lotapp_request_seconds": ("endpoint", "Total time to answer a request."),
+        "lotapp_response_bytes": ("endpoint", "Response body size."),
+    }
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.lock = threading.Lock()
+        self.series = {}       # (name, label value) -> Series
+
+    def observe(self, name, label, value):
+        with self.lock:
+            series = self.series.get((name, label))
+            if series is None:
+                series = self.series[(name, label)] = Series(self.window)
+            series.observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (label, text) in self.HELP.items():
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} summary")
+
+                for (metric, value), series in sorted(self.series.items()):
+                    if metric != name:
+                        continue
+
+                    tag = f'{label}="{escape(value)}"'
+                    for q, v in series.quantiles().items():
+                        lines.append(f'{name}{{{tag},quantile="{q}"}} {v:.6g}')
+                    lines.append(f"{name}_sum{{{tag}}} {series.total:.6g}")
+                    lines.append(f"{name}_count{{{tag}}} {series.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# one registry per worker process
+metrics = Metrics()
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block (or, as a decorator, a call) as `stage`: aggregated
+    into lotapp_stage_seconds and, inside a request, added to its
+    Server-Timing header. Works the same in background threads.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("lotapp_stage_seconds", stage, elapsed)
+
+        if has_request_context():
+            stages = g.setdefault("server_timing", {})
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+def server_timing(total=None):
+    """Server-Timing header value for this request's stages (ms)."""
+    stages = dict(g.get("server_timing", {}))
+    if total is not None:
+        stages["total"] = total
+    return ", ".join(f"{name};dur={secs * 1000:.1f}" for name, secs in stages.items())
@@ -7,7 +7,13 @@
 # ✔ All patterns always included with None when absent
 # ================================================================
 
-from collections import Counter
+from collections import deque
+
+import numpy as np
+
+from digit_matrix import DigitMatrix, rows_matrix
+from engine_pool import run_tasks
+from sequence_index import OccurrenceIndex
 
 
 # ============================================================
@@ -38,24 +44,81 @@ def compute_transitions(col):
 # ============================================================
 # FOLLOW FIXED SEQUENCE
 # ============================================================
-def follow_fixed_sequence(seq, digits):
+def find_sequence(seq, pattern, end=None):
+    """
+    Start of every occurrence of pattern inside seq[:end], oldest first.
+    Knuth-Morris-Pratt: one pass over seq, no slice per offset.
+    """
+    m = len(pattern)
+    n = len(seq) if end is None else min(end, len(seq))
+    if m == 0 or n < m:
+        return
+
+    fail = [0] * m
+    k = 0
+    for q in range(1, m):
+        while k and pattern[q] != pattern[k]:
+            k = fail[k - 1]
+        if pattern[q] == pattern[k]:
+            k += 1
+        fail[q] = k
+
+    k = 0
+    for i in range(n):
+        x = seq[i]
+        while k and x != pattern[k]:
+            k = fail[k - 1]
+        if x == pattern[k]:
+            k += 1
+        if k == m:
+            yield i - m + 1
+            k = fail[k - 1]
+
+
+def _follow_context(seq, i, L):
+    before = seq[max(0, i + L - 5):i + L]     # last 5 only
+    after = seq[i + L:i + L + 5]              # first 5 only
+    return before, seq[-L:], after
+
+
+def follow_fixed_sequence(seq, digits, index=None):
+    """
+    First earlier occurrence of the trailing `digits` values, with up to
+    5 values of context either side. index: OccurrenceIndex over seq.
+    """
     if len(seq) < digits + 1:
         return None, None, None
 
-    base = seq[-digits:]
     L = digits
+    base = seq[-L:]
+    limit = len(seq) - L - 2          # last start with a non-trailing follower
+
+    if index is not None:
+        i = index.first(base, limit)
+    else:
+        i = next(find_sequence(seq, base, limit + L), None)
+
+    if i is None:
+        return None, None, None
 
-    for i in range(len(seq) - L - 1):
-        if seq[i:i + L] == base:
-            full_before = seq[:i + L]
-            before = full_before[-5:]     # last 5 only
+    return _follow_context(seq, i, L)
 
-            full_after = seq[i + L:]
-            after = full_after[:5]        # first 5 only
 
-            return before, base, after
+def follow_fixed_matches(seq, digits, index=None):
+    """Every occurrence follow_fixed_sequence() considers, oldest first."""
+    if len(seq) < digits + 1:
+        return []
+
+    L = digits
+    base = seq[-L:]
+    limit = len(seq) - L - 2
 
-    return None, None, None
+    if index is not None:
+        starts = index.all(base, limit)
+    else:
+        starts = find_sequence(seq, base, limit + L)
+
+    return [_follow_context(seq, i, L) for i in starts]
 
 
 # ============================================================
@@ -112,14 +175,231 @@ def detect_reset(mod):
     return sum(x >= 7 for x in mod) >= 3
 
 
+# ============================================================
+# STREAMING DETECTORS
+# ============================================================
+# Same answers as the detect_* functions above, kept up to date one
+# transition at a time so a growing column is never rescanned. fit()
+# builds the state for a whole column with vectorized NumPy.
+
+def _trailing_true(flags):
+    """Length of the run of True at the end of a bool array."""
+    misses = np.flatnonzero(~flags)
+    return len(flags) - (misses[-1] + 1) if misses.size else len(flags)
+
+
+def _first_true(flags):
+    hits = np.flatnonzero(flags)
+    return int(hits[0]) if hits.size else None
+
+
+class CycleDetector:
+    """detect_cycle(mod): trailing matches of mod[j] == mod[j - L], L = 2..7."""
+
+    LENGTHS = range(2, 8)
+
+    def __init__(self):
+        self.n = 0
+        self.tail = deque(maxlen=2 * self.LENGTHS[-1])
+        self.runs = dict.fromkeys(self.LENGTHS, 0)
+
+    @classmethod
+    def fit(cls, mod):
+        det = cls()
+        det.n = len(mod)
+        det.tail.extend(mod[-det.tail.maxlen:].tolist())
+        for L in cls.LENGTHS:
+            if len(mod) > L:
+                det.runs[L] = int(_trailing_true(mod[L:] == mod[:-L]))
+        return det
+
+    def push(self, m):
+        self.tail.append(m)
+        self.n += 1
+        tail = self.tail
+        for L in self.LENGTHS:
+            if len(tail) > L and tail[-1] == tail[-1 - L]:
+                self.runs[L] += 1
+            else:
+                self.runs[L] = 0
+
+    def value(self):
+        n = self.n
+        if n < 6:
+            return None
+        for L in range(2, min(8, n // 2 + 1)):
+            if self.runs[L] >= L:
+                return list(self.tail)[-L:]
+        return None
+
+
+class MirrorDetector:
+    """detect_mirror(mod): first a, b, c, d with a = -b and c = -d (mod 10)."""
+
+    def __init__(self):
+        self.last4 = deque(maxlen=4)
+        self.hit = None
+
+    @classmethod
+    def fit(cls, mod):
+        det = cls()
+        det.last4.extend(mod[-4:].tolist())
+        pairs = (mod[:-1] % 10) == (-mod[1:] % 10)
+        i = _first_true(pairs[:-2] & pairs[2:])
+        if i is not None:
+            det.hit = int(mod[i])
+        return det
+
+    def push(self, m):
+        self.last4.append(m)
+        if self.hit is None and len(self.last4) == 4:
+            a, b, c, d = self.last4
+            if (a % 10) == ((-b) % 10) and (c % 10) == ((-d) % 10):
+                self.hit = a
+
+    def value(self):
+        return self.hit
+
+
+class DriftDetector:
+    """detect_drift(col): running up / down counts."""
+
+    def __init__(self):
+        self.n = 0
+        self.prev = None
+        self.ups = 0
+        self.downs = 0
+
+    @classmethod
+    def fit(cls, col):
+        det = cls()
+        if len(col):
+            raw = np.diff(col)
+            det.n = len(col)
+            det.prev = int(col[-1])
+            det.ups = int((raw > 0).sum())
+            det.downs = int((raw < 0).sum())
+        return det
+
+    def push(self, x):
+        if self.n:
+            self.ups += x > self.prev
+            self.downs += x < self.prev
+        self.prev = x
+        self.n += 1
+
+    def value(self):
+        if self.n < 3:
+            return None
+
+        total = self.n - 1
+        if self.ups >= total * 0.65:
+            return "UP"
+        if self.downs >= total * 0.65:
+            return "DOWN"
+        return None
+
+
+class FreezeDetector:
+    """detect_freeze(col): value of the first run of 4 equal digits."""
+
+    def __init__(self):
+        self.prev = None
+        self.streak = 0
+        self.hit = None
+
+    @classmethod
+    def fit(cls, col):
+        det = cls()
+        if len(col):
+            same = np.diff(col) == 0
+            det.prev = int(col[-1])
+            det.streak = int(_trailing_true(same)) + 1
+            i = _first_true(same[:-2] & same[1:-1] & same[2:])
+            if i is not None:
+                det.hit = int(col[i + 3])
+        return det
+
+    def push(self, x):
+        self.streak = self.streak + 1 if self.streak and x == self.prev else 1
+        self.prev = x
+        if self.hit is None and self.streak >= 4:
+            self.hit = x
+
+    def value(self):
+        return self.hit
+
+
+class ResetDetector:
+    """detect_reset(mod) plus the most common mod (Counter tie order)."""
+
+    def __init__(self):
+        self.high = 0
+        self.counts = {}
+
+    @classmethod
+    def fit(cls, mod):
+        det = cls()
+        det.high = int((mod >= 7).sum())
+        values, first, counts = np.unique(mod, return_index=True, return_counts=True)
+        for k in np.argsort(first):
+            det.counts[int(values[k])] = int(counts[k])
+        return det
+
+    def push(self, m):
+        self.high += m >= 7
+        self.counts[m] = self.counts.get(m, 0) + 1
+
+    def value(self):
+        return self.high >= 3
+
+    def most_common(self):
+        # max() keeps the first-inserted key on ties, like most_common(1)
+        return max(self.counts, key=self.counts.get)
+
+
+class ColumnDetectors:
+    """All detectors for one column; push() one digit and its mod."""
+
+    def __init__(self):
+        self.cycle = CycleDetector()
+        self.mirror = MirrorDetector()
+        self.drift = DriftDetector()
+        self.freeze = FreezeDetector()
+        self.reset = ResetDetector()
+
+    @classmethod
+    def fit(cls, col, mod):
+        col = np.asarray(col, dtype=np.int64)
+        mod = np.asarray(mod, dtype=np.int64)
+
+        det = cls()
+        det.cycle = CycleDetector.fit(mod)
+        det.mirror = MirrorDetector.fit(mod)
+        det.drift = DriftDetector.fit(col)
+        det.freeze = FreezeDetector.fit(col)
+        det.reset = ResetDetector.fit(mod)
+        return det
+
+    def push(self, x, m=None):
+        self.drift.push(x)
+        self.freeze.push(x)
+        if m is not None:
+            self.cycle.push(m)
+            self.mirror.push(m)
+            self.reset.push(m)
+
+
 # ============================================================
 # DECISION ENGINE
 # ============================================================
-def decide_next(col, raw, mod, col_name, digits):
+def decide_next(col, raw, mod, col_name, digits, detectors=None, index=None):
+    # detectors: ColumnDetectors already fed with col / mod (else built here)
+    # index: OccurrenceIndex(digits) over col (else searched here)
     seq = col
     last = seq[-1]
 
-    before, base, after = follow_fixed_sequence(seq, digits)
+    before, base, after = follow_fixed_sequence(seq, digits, index)
 
     results = {
         "before": before,
@@ -139,11 +419,13 @@ def decide_next(col, raw, mod, col_name, digits):
         results["final"] = after[0] if after else last
         return results
 
-    cycle = detect_cycle(mod)
-    mirror = detect_mirror(mod)
-    drift = detect_drift(seq)
-    freeze = detect_freeze(seq)
-    reset = detect_reset(mod)
+    det = detectors or ColumnDetectors.fit(seq, mod)
+
+    cycle = det.cycle.value()
+    mirror = det.mirror.value()
+    drift = det.drift.value()
+    freeze = det.freeze.value()
+    reset = det.reset.value()
 
     results["cycle"] = (last + cycle[0]) % 10 if cycle else None
     results["mirror"] = (last + mirror) % 10 if mirror is not None else None
@@ -154,7 +436,7 @@ def decide_next(col, raw, mod, col_name, digits):
         results["drift"] = (last - 1) % 10
 
     results["freeze"] = freeze
-    results["reset"] = (last + Counter(mod).most_common(1)[0][0]) % 10 if reset else None
+    results["reset"] = (last + det.reset.most_common()) % 10 if reset else None
     results["fallback"] = (last + mod[-1]) % 10 if mod else None
     results["custom"] = None
 
@@ -168,84 +450,210 @@ def decide_next(col, raw, mod, col_name, digits):
 
 
 # ============================================================
-# MULTI-STEP FORECAST
+# PER-COLUMN STATE
 # ============================================================
-def predict_series(values, digits, steps=5):
-    seq = list(values)
-    out = []
+def column_name(idx, digits):
+    return (
+        ["A", "B", "C"][idx] if digits == 3 else
+        ["A", "B"][idx] if digits == 2 else
+        str(idx)
+    )
 
-    for _ in range(steps):
-        norm = normalize(seq, digits)
-        if len(norm) < 3:
-            break
 
-        cols = list(zip(*norm))
-        next_digits = []
+# column_data / raw / mod values kept per analysis row (None = all)
+ANALYSIS_TAIL = 30
+
+
+class ColumnBuffer:
+    """col / raw / mod of one column, shared by all its analysis rows."""
+
+    __slots__ = ("col", "raw", "mod", "offset")
+
+    def __init__(self, col, raw, mod):
+        self.col = col
+        self.raw = raw
+        self.mod = mod
+        self.offset = 0          # leading values dropped by compact()
+
+    def compact(self, start):
+        """Keep col[start:] and the transitions out of it."""
+        cut = start - self.offset
+        if cut > 0:
+            self.col = self.col[cut:]
+            self.raw = self.raw[cut:]
+            self.mod = self.mod[cut:]
+            self.offset = start
+
+
+class ColumnAnalysis:
+    """
+    One column's decide_next() row. column_data / raw / mod are the last
+    `tail` values (None = all) as of this step, sliced on access from
+    the column's shared ColumnBuffer instead of copied per step.
+    Reads like the old dict row: row.next or row["next"].
+    """
+
+    __slots__ = ("column", "patterns", "next", "_buf", "_end", "_tail")
+
+    FIELDS = ("column", "column_data", "raw", "mod", "patterns", "next")
+
+    def __init__(self, column, patterns, buf, end, tail=ANALYSIS_TAIL):
+        self.column = column
+        self.patterns = patterns
+        self.next = patterns["final"]
+        self._buf = buf
+        self._end = end          # column length when this row was analyzed
+        self._tail = tail
+
+    def _slice(self, seq, end):
+        lo = 0 if self._tail is None else max(0, end - self._tail)
+        off = self._buf.offset
+        return seq[lo - off:end - off]
+
+    @property
+    def column_data(self):
+        return self._slice(self._buf.col, self._end)
+
+    @property
+    def raw(self):
+        return self._slice(self._buf.raw, self._end - 1)
+
+    @property
+    def mod(self):
+        return self._slice(self._buf.mod, self._end - 1)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+
+class ColumnState:
+    """
+    One digit column plus its raw / mod transitions.
+
+    append() adds a digit and its transition in O(1), so a forecast
+    grows the column in place instead of re-normalizing the series and
+    re-running compute_transitions() and the detectors every step.
+    """
+
+    def __init__(self, col, name, digits):
+        self.name = name
+        self.digits = digits
+
+        # vectorized start: diffs, mod-10 transitions, detector state
+        col = np.asarray(col, dtype=np.int64)
+        raw = np.diff(col)
+        mod = raw % 10
+
+        self.col = col.tolist()
+        self.raw = raw.tolist()
+        self.mod = mod.tolist()
+        self.detectors = ColumnDetectors.fit(col, mod)
+        self.index = OccurrenceIndex.build(digits, col)
+
+        self.buffer = ColumnBuffer(self.col, self.raw, self.mod)
+        self.first_end = None    # column length at the first analyze()
+
+    def append(self, digit):
+        diff = digit - self.col[-1]
+        self.raw.append(diff)
+        self.mod.append(diff % 10)
+        self.col.append(digit)
+        self.detectors.push(digit, diff % 10)
+        self.index.append(digit)
+
+    def analyze(self, tail=ANALYSIS_TAIL):
+        """decide_next() on the current column as a ColumnAnalysis row."""
+        result = decide_next(
+            self.col, self.raw, self.mod, self.name, self.digits,
+            self.detectors, self.index
+        )
+        end = len(self.col)
+        if self.first_end is None:
+            self.first_end = end
+        return ColumnAnalysis(self.name, result, self.buffer, end, tail)
+
+    def compact(self, tail=ANALYSIS_TAIL):
+        """
+        Shrink the shared buffer to what the rows can show (call once the
+        analysis is done; the rows keep the buffer, the state is dropped).
+        """
+        if tail is not None and self.first_end is not None:
+            self.buffer.compact(max(0, self.first_end - 1 - tail))
+
+
+def column_states(matrix, digits):
+    """(N, digits) digit matrix -> one ColumnState per column."""
+    if not len(matrix):
+        return []
+    return [
+        ColumnState(matrix[:, idx], column_name(idx, digits), digits)
+        for idx in range(digits)
+    ]
+
+
+def forecast(states, steps=5, tail=ANALYSIS_TAIL):
+    """
+    Fused forecast + analysis: [(value, analysis), ...] for the next
+    steps + 1 draws. Each step runs decide_next() once per column and
+    feeds the predicted digit straight back into the column state.
+    """
+    out = []
+
+    for _ in range(steps + 1):
+        analysis = [s.analyze(tail) for s in states]
+        out.append(("".join(str(a.next) for a in analysis), analysis))
 
-        for idx, col in enumerate(cols):
-            col = list(col)
-            raw, mod = compute_transitions(col)
+        for s, a in zip(states, analysis):
+            s.append(a.next)
 
-            col_name = (
-                ["A", "B", "C"][idx] if digits == 3 else
-                ["A", "B"][idx] if digits == 2 else
-                str(idx)
-            )
+    for s in states:
+        s.compact(tail)
 
-            result = decide_next(col, raw, mod, col_name, digits)
-            next_digits.append(result["final"])
+    return out
 
-        next_val = "".join(str(x) for x in next_digits)
-        out.append(next_val)
-        seq.append(next_val)
 
-    return out
+# ============================================================
+# MULTI-STEP FORECAST
+# ============================================================
+def predict_series(values, digits, steps=5):
+    norm = normalize(values, digits)
+    if len(norm) < 3:
+        return []
+    states = column_states(rows_matrix(norm, digits), digits)
+    return [value for value, _ in forecast(states, steps - 1)]
 
 
 # ============================================================
 # DEEP ANALYSIS OF NEXT SERIES (🔥 FIXED)
 # ============================================================
-def analyze_next_series(history_list, digits, next_series):
+def analyze_next_series(history_list, digits, next_series, tail=ANALYSIS_TAIL):
+    states = column_states(rows_matrix(normalize(history_list, digits), digits), digits)
     analysis_out = []
-    seq = list(history_list)
 
     for step_index, val in enumerate(next_series, start=1):
 
         # ✅ ANALYZE FIRST — DO NOT APPEND YET
-        norm = normalize(seq, digits)
-        cols = list(zip(*norm))
-
-        step_analysis = []
-
-        for idx, col in enumerate(cols):
-            col = list(col)
-            raw, mod = compute_transitions(col)
-
-            col_name = (
-                ["A", "B", "C"][idx] if digits == 3 else
-                ["A", "B"][idx] if digits == 2 else
-                str(idx)
-            )
-
-            result = decide_next(col, raw, mod, col_name, digits)
-
-            step_analysis.append({
-                "column": col_name,
-                "column_data": col,
-                "raw": raw,
-                "mod": mod,
-                "patterns": result,
-                "next": result["final"]
-            })
-
         analysis_out.append({
             "step": step_index,
             "value": val,
-            "analysis": step_analysis
+            "analysis": [s.analyze(tail) for s in states]
         })
 
         # ✅ APPEND AFTER ANALYSIS
-        seq.append(val)
+        for row in normalize([val], digits):
+            if not states:
+                states = column_states(rows_matrix([row], digits), digits)
+                continue
+            for s, d in zip(states, row):
+                s.append(d)
+
+    for s in states:
+        s.compact(tail)
 
     return analysis_out
 
@@ -253,66 +661,64 @@ def analyze_next_series(history_list, digits, next_series):
 # ============================================================
 # MAIN ENTRY FUNCTION
 # ============================================================
-def analyze_history_patterns(history):
-    output = {}
-
-    categories = {
-        "LAST4": 4,
-        "LAST3": 3,
-        "AB": 2,
-        "BC": 2,
-        "AC": 2,
-        "A": 1,
-        "B": 1,
-        "C": 1,
+CATEGORIES = {
+    "LAST4": 4,
+    "LAST3": 3,
+    "AB": 2,
+    "BC": 2,
+    "AC": 2,
+    "A": 1,
+    "B": 1,
+    "C": 1,
+}
+
+
+def analyze_category(rows, digits, tail=ANALYSIS_TAIL):
+    """One category of analyze_history_patterns() from its (N, digits) matrix."""
+    if len(rows) < 3:
+        return {"error": "Not enough history"}
+
+    # step 0 = current prediction, steps 1..5 = next series; the
+    # analysis of step k is the decide_next() that produced step k
+    steps = forecast(column_states(rows, digits), 5, tail)
+
+    final_prediction, analysis = steps[0]
+    next_series = [value for value, _ in steps[1:]]
+
+    return {
+        "analysis": analysis,
+        "prediction": final_prediction,
+        "next_series": next_series,
+        "combined_predictions": [final_prediction] + next_series,
+        "next_series_analysis": [
+            {"step": i, "value": value, "analysis": step_analysis}
+            for i, (value, step_analysis) in enumerate(steps[1:], start=1)
+        ]
     }
 
-    for key, digits in categories.items():
-        values = history.get(key, [])
-        norm = normalize(values, digits)
 
-        if len(norm) < 3:
-            output[key] = {"error": "Not enough history"}
-            continue
+def category_tasks(history, tail=ANALYSIS_TAIL):
+    """One (analyze_category, rows, digits, tail) task per category, CATEGORIES order."""
 
-        cols = list(zip(*norm))
-        analysis = []
-        next_digits = []
-
-        for idx, col in enumerate(cols):
-            col = list(col)
-            raw, mod = compute_transitions(col)
-
-            col_name = (
-                ["A", "B", "C"][idx] if digits == 3 else
-                ["A", "B"][idx] if digits == 2 else
-                str(idx)
-            )
-
-            result = decide_next(col, raw, mod, col_name, digits)
-            analysis.append({
-                "column": col_name,
-                "column_data": col,
-                "raw": raw,
-                "mod": mod,
-                "patterns": result,
-                "next": result["final"]
-            })
-
-            next_digits.append(str(result["final"]))
-
-        final_prediction = "".join(next_digits)
-
-        next_series = predict_series(values + [final_prediction], digits, 5)
-        combined = [final_prediction] + next_series
-        next_series_analysis = analyze_next_series(values + [final_prediction], digits, next_series)
-
-        output[key] = {
-            "analysis": analysis,
-            "prediction": final_prediction,
-            "next_series": next_series,
-            "combined_predictions": combined,
-            "next_series_analysis": next_series_analysis
+    # history: {category: [values]} or a history_store.ColumnView
+    # (pre-parsed digit columns: one N x 5 matrix, categories as views)
+    if hasattr(history, "digit_rows"):
+        matrix = DigitMatrix(history)
+        rows = {key: matrix[key] for key in CATEGORIES}
+    else:
+        rows = {
+            key: rows_matrix(normalize(history.get(key, []), digits), digits)
+            for key, digits in CATEGORIES.items()
         }
 
-    return output
+    return [
+        (analyze_category, rows[key], digits, tail)
+        for key, digits in CATEGORIES.items()
+    ]
+
+
+def analyze_history_patterns(history, pool=None, tail=ANALYSIS_TAIL):
+    # pool: engine_pool.EnginePool to fan the categories out (else inline)
+    # tail: column_data / raw / mod values kept per row (None = all)
+    results = run_tasks(category_tasks(history, tail), pool)
+    return dict(zip(CATEGORIES, results))
@@ -5,7 +5,8 @@ Each row's next1, next2, next3 are predicted using rules updated step-by-step.
 """
 
 from typing import List, Dict, Any
-from collections import defaultdict, Counter
+
+import numpy as np
 
 
 # ----------------------------------------------------------
@@ -22,117 +23,177 @@ def _clean_digits_str(s: str) -> str:
 
 
 # ----------------------------------------------------------
-# TRAIN RULES FROM A SEQUENCE
+# ARRAY-BACKED TRANSITION MODEL (NUMPY)
 # ----------------------------------------------------------
 
-def train_rules(cleaned_seq: list):
-    """Build full-map & pos-map rules from a cleaned list."""
-
-    full_map_counts = defaultdict(Counter)
-    pos_map_counts = {i: defaultdict(Counter) for i in range(1, 6)}
-
-    # Build counters
-    for i in range(1, len(cleaned_seq)):
-        prev = cleaned_seq[i - 1]
-        cur = cleaned_seq[i]
-
-        full_map_counts[prev][cur] += 1
-
-        for pos in range(5):
-            # SAFETY CHECKS
-            if pos >= len(prev) or pos >= len(cur):
-                continue
-
-            if not prev[pos].isdigit() or not cur[pos].isdigit():
-                continue
+STATES = 100000                                  # every 5-digit winner
+POW = np.array([10000, 1000, 100, 10, 1], dtype=np.int64)
+_NEVER = np.iinfo(np.int64).max                  # "first seen" of an unseen pair
+_TIE = np.int64(1) << 40                         # count outranks first-seen
 
-            pd = int(prev[pos])
-            cd = int(cur[pos])
-            pos_map_counts[pos + 1][pd][cd] += 1
 
+def to_codes(cleaned_seq) -> np.ndarray:
+    """["01620", ...] -> array([1620, ...])"""
+    return np.array([int(s) for s in cleaned_seq], dtype=np.int64)
 
-    # Extract full-map most common transitions
-    full_map = {}
-    for prev, cnt in full_map_counts.items():
-        nxt, _ = cnt.most_common(1)[0]
-        full_map[prev] = nxt
 
-    # Extract pos-map transitions
-    pos_map = {i: {} for i in range(1, 6)}
-    for pos in range(1, 6):
-        for pd, cnt in pos_map_counts[pos].items():
-            nxt, _ = cnt.most_common(1)[0]
-            pos_map[pos][pd] = nxt
+def code_str(code) -> str:
+    return "%05d" % code
 
-    return full_map, pos_map
 
+class TransitionTensors:
+    """
+    Empirical predictor trained on a sequence of 5-digit winners.
 
-# ----------------------------------------------------------
-# EMPIRICAL PREDICTOR
-# ----------------------------------------------------------
+    pos map : 5x10x10 count tensor (+ first-seen stamps for ties):
+              most common next digit per (position, digit)
+    full map: hashed pair counts + dense 100000-state best-follower table:
+              most common next winner per winner
 
-def empirical_predict(prev_full: str, full_map, pos_map):
+    Ties go to the follower seen first (Counter.most_common(1) order).
+    fit() trains a whole prefix in a few vectorized ops; add() /
+    remove() update one transition in O(1) for what-if chains;
+    predict() scores a batch of previous draws.
     """
-    Weighted Hybrid Predictor
-    Combines:
-    - Full-map (strongest weight)
-    - Digit-map (fallback)
-    - Mirror rule (lottery logic)
-    - Trend rule (+1 digit trend)
-    """
-
-    prev_full = _clean_digits_str(prev_full)
 
-    # ----------------------------------------------------
-    # 1) FULL-MAP PREDICTION (strongest, weight 5)
-    # ----------------------------------------------------
-    if prev_full in full_map:
-        full_map_pred = full_map[prev_full]
-    else:
-        full_map_pred = None
-
-    # ----------------------------------------------------
-    # 2) DIGIT-MAP PREDICTION (weight 3)
-    # ----------------------------------------------------
-    digit_pred = []
-    for pos in range(1, 6):
-        digit = int(prev_full[pos - 1])
-        if digit in pos_map[pos]:
-            digit_pred.append(str(pos_map[pos][digit]))
+    def __init__(self):
+        self.t = 0                                             # transitions seen
+
+        self.pos_counts = np.zeros((5, 10, 10), dtype=np.int32)
+        self.pos_first = np.full((5, 10, 10), _NEVER, dtype=np.int64)
+
+        self.pairs = {}                                        # prev*STATES+cur -> [count, first]
+        self.best = np.full(STATES, -1, dtype=np.int64)
+        self.best_count = np.zeros(STATES, dtype=np.int64)
+        self.best_first = np.full(STATES, _NEVER, dtype=np.int64)
+
+        self._undo = []
+
+    # ------------------------------------------------------
+    # BULK TRAINING
+    # ------------------------------------------------------
+    def fit(self, codes):
+        """Train on a full sequence of codes."""
+        self.__init__()
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(codes) < 2:
+            return self
+
+        prev, cur = codes[:-1], codes[1:]
+        stamps = np.arange(len(prev), dtype=np.int64)
+
+        # position tensor
+        pd = (prev[:, None] // POW) % 10
+        cd = (cur[:, None] // POW) % 10
+        flat = (np.arange(5) * 100 + pd * 10 + cd).ravel()
+        self.pos_counts = np.bincount(flat, minlength=500).astype(np.int32).reshape(5, 10, 10)
+        first = np.full(500, _NEVER, dtype=np.int64)
+        np.minimum.at(first, flat, np.repeat(stamps, 5))
+        self.pos_first = first.reshape(5, 10, 10)
+
+        # full map: unique pairs, then best follower per prev
+        pair = prev * STATES + cur
+        uniq, first_idx, counts = np.unique(pair, return_index=True, return_counts=True)
+        first_seen = stamps[first_idx]
+        self.pairs = {
+            int(k): [int(c), int(f)]
+            for k, c, f in zip(uniq, counts, first_seen)
+        }
+
+        p_of, c_of = uniq // STATES, uniq % STATES
+        order = np.lexsort((first_seen, -counts, p_of))
+        _, head = np.unique(p_of[order], return_index=True)
+        top = order[head]
+        self.best[p_of[top]] = c_of[top]
+        self.best_count[p_of[top]] = counts[top]
+        self.best_first[p_of[top]] = first_seen[top]
+
+        self.t = len(prev)
+        return self
+
+    # ------------------------------------------------------
+    # ONE TRANSITION (WHAT-IF)
+    # ------------------------------------------------------
+    def add(self, prev, cur):
+        prev, cur = int(prev), int(cur)
+        t = self.t
+        self.t += 1
+
+        key = prev * STATES + cur
+        entry = self.pairs.get(key)
+        created = entry is None
+        if created:
+            entry = self.pairs[key] = [0, t]
+        entry[0] += 1
+
+        saved = (int(self.best[prev]), int(self.best_count[prev]), int(self.best_first[prev]))
+        count, first = entry
+        if (count > saved[1]) or (count == saved[1] and first < saved[2]):
+            self.best[prev] = cur
+            self.best_count[prev] = count
+            self.best_first[prev] = first
+
+        idx = (np.arange(5), (prev // POW) % 10, (cur // POW) % 10)
+        fresh = self.pos_counts[idx] == 0
+        self.pos_counts[idx] += 1
+        self.pos_first[idx] = np.where(fresh, t, self.pos_first[idx])
+
+        self._undo.append((prev, key, created, saved, idx, fresh))
+
+    def remove(self, prev, cur):
+        """Undo the most recent add(prev, cur)."""
+        prev, key, created, saved, idx, fresh = self._undo.pop()
+        self.t -= 1
+
+        if created:
+            del self.pairs[key]
         else:
-            digit_pred.append(str(digit))
-    digit_pred = "".join(digit_pred)
-
-    # ----------------------------------------------------
-    # 3) MIRROR RULE PREDICTION (weight 1)
-    #    last digit → (digit + 5) % 10
-    # ----------------------------------------------------
-    last_digit = int(prev_full[-1])
-    mirror_digit = (last_digit + 5) % 10
-    mirror_pred = prev_full[:-1] + str(mirror_digit)
-
-    # ----------------------------------------------------
-    # 4) TREND RULE PREDICTION (weight 1)
-    #    last digit → (digit + 1) % 10
-    # ----------------------------------------------------
-    trend_digit = (last_digit + 1) % 10
-    trend_pred = prev_full[:-1] + str(trend_digit)
-
-    # ----------------------------------------------------
-    # 5) Weighted Voting System
-    # ----------------------------------------------------
-    votes = Counter()
-
-    if full_map_pred:
-        votes[full_map_pred] += 5
-
-    votes[digit_pred] += 3
-    votes[mirror_pred] += 1
-    votes[trend_pred] += 1
-
-    # Return highest-weighted prediction
-    best_prediction = votes.most_common(1)[0][0]
-    return best_prediction
+            self.pairs[key][0] -= 1
+        self.best[prev], self.best_count[prev], self.best_first[prev] = saved
+
+        self.pos_counts[idx] -= 1
+        self.pos_first[idx] = np.where(fresh, _NEVER, self.pos_first[idx])
+
+    # ------------------------------------------------------
+    # PREDICTION (WEIGHTED VOTE, VECTORIZED)
+    # ------------------------------------------------------
+    def predict(self, prev_codes):
+        """
+        Next code per previous code, by weighted vote: full map (5),
+        digit map (3), mirror rule last digit + 5 (1), trend rule
+        last digit + 1 (1).
+        """
+        P = np.atleast_1d(np.asarray(prev_codes, dtype=np.int64))
+
+        # digit-map (weight 3): most common next digit per (pos, digit)
+        seen = self.pos_counts > 0
+        score = np.where(seen, self.pos_counts * _TIE - self.pos_first, -1)
+        pos_best = score.argmax(axis=2)
+        pos_has = seen.any(axis=2)
+
+        digits = (P[:, None] // POW) % 10
+        k = np.arange(5)
+        next_digits = np.where(pos_has[k, digits], pos_best[k, digits], digits)
+        digit_pred = (next_digits * POW).sum(axis=1)
+
+        # full-map (weight 5), mirror / trend on last digit (weight 1)
+        full_pred = self.best[P]
+        last = digits[:, 4]
+        mirror_pred = P - last + (last + 5) % 10
+        trend_pred = P - last + (last + 1) % 10
+
+        # weighted vote; ties -> first candidate (Counter insertion order)
+        cands = np.stack([full_pred, digit_pred, mirror_pred, trend_pred], axis=1)
+        weights = np.array([5, 3, 1, 1]) * (cands >= 0)
+        same = cands[:, :, None] == cands[:, None, :]
+        votes = (same * weights[:, None, :]).sum(axis=2)
+        votes[cands < 0] = -1
+
+        return cands[np.arange(len(P)), votes.argmax(axis=1)]
+
+    def predict_one(self, prev_code):
+        return int(self.predict([prev_code])[0])
+
 
 def safe_get(row, key, default=None):
     try:
@@ -145,35 +206,64 @@ def safe_get(row, key, default=None):
 # MAIN FUNCTION
 # ----------------------------------------------------------
 
-def analyze_patterns(historyData: List[Any]) -> Dict[str, Any]:
+def analyze_patterns(historyData: List[Any], last_n: int = 10) -> Dict[str, Any]:
+    fn, *args = patterns_task(historyData, last_n)
+    return fn(*args)
+
+
+def patterns_task(historyData: List[Any], last_n: int = 10):
+    """(analyze_codes, codes, times, last_n) — picklable for engine_pool."""
 
-    cleaned = []
     times = []
 
-    # Step 1 — clean winners + capture time_col (SAFE)
-    for row in historyData:
-        raw = safe_get(row, "winner", "")
-        time_val = safe_get(row, "time_col")
+    # Step 1 — winners as 5-digit codes + capture time_col (SAFE)
+    if hasattr(historyData, "winner_columns"):
+        # history_store.ColumnView: digit columns, nothing to parse
+        cols = [np.asarray(c, dtype=np.int64) for c in historyData.winner_columns()]
+        codes = (np.stack(cols, axis=1) * POW).sum(axis=1) if cols else np.zeros(0, np.int64)
+        times = historyData.times()
+
+    else:
+        cleaned = []
+        for row in historyData:
+            raw = safe_get(row, "winner", "")
+            time_val = safe_get(row, "time_col")
+
+            cleaned.append(_clean_digits_str(raw))
+            times.append(time_val)
+        codes = to_codes(cleaned)
 
-        cleaned.append(_clean_digits_str(raw))
-        times.append(time_val)
+    return analyze_codes, codes, times, last_n
 
+
+def analyze_codes(codes, times, last_n: int = 10) -> Dict[str, Any]:
     pattern_rows = []
 
-    # Step 2 — generate predictions row-by-row
-    for i, prev in enumerate(cleaned):
+    # Step 2 — train the prefix in bulk, then one transition per shown
+    # row; next2 / next3 are what-if transitions rolled back afterwards
+    n = len(codes)
+    first_shown = max(0, n - last_n)
+    model = TransitionTensors().fit(codes[: first_shown + 1])
+
+    for i in range(first_shown, n):
+        prev = int(codes[i])
+
+        # model trained on codes[: i + 1]
+        if i > first_shown:
+            model.add(codes[i - 1], prev)
+
+        next1 = model.predict_one(prev)
+
+        model.add(prev, next1)              # what-if: slice1 + [next1]
+        next2 = model.predict_one(next1)
 
-        slice1 = cleaned[: i + 1]
-        full1, pos1 = train_rules(slice1)
-        next1 = empirical_predict(prev, full1, pos1)
+        model.add(next1, next2)             # what-if: slice2 + [next2]
+        next3 = model.predict_one(next2)
 
-        slice2 = slice1 + [next1]
-        full2, pos2 = train_rules(slice2)
-        next2 = empirical_predict(next1, full2, pos2)
+        model.remove(next1, next2)
+        model.remove(prev, next1)
 
-        slice3 = slice2 + [next2]
-        full3, pos3 = train_rules(slice3)
-        next3 = empirical_predict(next2, full3, pos3)
+        next1, next2, next3 = code_str(next1), code_str(next2), code_str(next3)
 
         digits = [int(d) for d in next1]
         rev = digits[::-1]
@@ -181,7 +271,7 @@ def analyze_patterns(historyData: List[Any]) -> Dict[str, Any]:
         pattern_rows.append({
             "Pattern": "Empirical-Historical",
             "index": i,
-            "winner": prev,
+            "winner": code_str(prev),
             "time_col": times[i],   # ✅ works now
             "next1": next1,
             "next2": next2,
@@ -193,5 +283,4 @@ def analyze_patterns(historyData: List[Any]) -> Dict[str, Any]:
             "c":   rev[0] if len(rev) > 0 else None,
         })
 
-    rows_all = pattern_rows[-10:] if len(pattern_rows) >= 10 else pattern_rows
-    return {"rows": rows_all, "rules": {}}
+    return {"rows": pattern_rows, "rules": {}}
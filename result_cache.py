@@ -0,0 +1,115 @@
+# result_cache.py
+# ------------------------------------------------------
+#  ENGINE RESULTS SHARED BY EVERY WORKER PROCESS
+# ------------------------------------------------------
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_MISS = object()
+
+
+def lock_owner():
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+@contextmanager
+def single_flight(db, key, lease):
+    """
+    Cross-worker lease on `key` (cache_locks in DatabaseManager).
+    Yields True for the one caller that got it, False for the others.
+    A crashed holder's lease runs out after `lease` seconds.
+    """
+    owner = lock_owner()
+    held = db.acquire_cache_lock(key, owner, lease)
+    try:
+        yield held
+    finally:
+        if held:
+            db.release_cache_lock(key, owner)
+
+
+class ResultCache:
+    """
+    JSON results in lottery.db (result_cache), so gunicorn workers
+    share one copy instead of each computing and holding its own.
+
+    Keys are engine + release + filter + data version: a write or a
+    deploy never serves stale output. Old versions simply stop being
+    read and age out; other releases' entries are dropped on start.
+    Entries live at most `ttl` seconds and the table is trimmed to
+    `max_bytes` of payload, least recently used first. Use is recorded
+    at most every `touch_after` seconds per entry, so a hit is a read.
+
+    get_or_compute() is single-flight: on a cold key one caller (any
+    worker / thread) computes, the others wait for its result, polling
+    from `poll` up to every `max_poll` seconds.
+    """
+
+    def __init__(self, db, release="", max_bytes=64 * 1024 * 1024, ttl=24 * 3600,
+                 lease=120, poll=0.05, max_poll=1.0, touch_after=60):
+        self.db = db
+        self.release = release
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lease = lease      # longest a computation may hold a key
+        self.poll = poll
+        self.max_poll = max_poll
+        self.touch_after = touch_after
+
+        # results of an older deploy are never read again
+        db.clear_cached_results(keep_release=release)
+
+    def key(self, engine, filters, data_version):
+        return f"{engine}:{self.release}:{json.dumps(filters, sort_keys=True)}:{data_version}"
+
+    # ------------------------------------------------------
+    # GET / PUT
+    # ------------------------------------------------------
+    def get(self, key):
+        payload = self.db.get_cached_result(key, self.ttl, self.touch_after)
+        return _MISS if payload is None else json.loads(payload)
+
+    def put(self, key, engine, value):
+        payload = json.dumps(value)
+        # one result larger than the whole budget would evict everything
+        if len(payload) <= self.max_bytes:
+            self.db.store_cached_result(
+                key, engine, self.release, payload, self.max_bytes, self.ttl
+            )
+
+    # ------------------------------------------------------
+    # SINGLE-FLIGHT LOOKUP
+    # ------------------------------------------------------
+    def get_or_compute(self, engine, filters, data_version, compute):
+        """
+        Cached result for (engine, filters, data_version), else compute()
+        (must return plain JSON values) once across all workers.
+        """
+        key = self.key(engine, filters, data_version)
+        deadline = time.monotonic() + self.lease
+        delay = self.poll
+
+        while True:
+            value = self.get(key)
+            if value is not _MISS:
+                return value
+
+            with single_flight(self.db, key, self.lease) as held:
+                if held:
+                    # filled between our miss and the lease?
+                    value = self.get(key)
+                    if value is _MISS:
+                        value = compute()
+                        self.put(key, engine, value)
+                    return value
+
+            # someone else is computing it: back off, every retry is a
+            # read plus a lease attempt (a write) on the shared DB
+            if time.monotonic() > deadline:
+                return compute()
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_poll)
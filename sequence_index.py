@@ -0,0 +1,211 @@
+# sequence_index.py
+# ------------------------------------------------------
+#  N-GRAM FOLLOW INDEX ("WHAT CAME AFTER THIS SEQUENCE?")
+# ------------------------------------------------------
+
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FollowIndex:
+    """
+    Every length-1..max_len window of a value sequence -> start
+    positions of that window which have a following value.
+
+    append() is O(max_len); follow() costs O(matches), not O(history).
+    Gives the same matches, in the same order, as a sliding-window scan.
+    """
+
+    def __init__(self, max_len=4):
+        self.max_len = max_len
+        self.values = []
+        self.ids = []
+        self.index = {}        # tuple(window) -> [start, ...]
+
+    @classmethod
+    def build(cls, items, max_len=4):
+        """items: [{"value": v, "id": row_id}, ...] (build_predictions shape)."""
+        idx = cls(max_len)
+        idx.extend((x["value"], x["id"]) for x in items)
+        return idx
+
+    def __len__(self):
+        return len(self.values)
+
+    # ------------------------------------------------------
+    # INCREMENTAL UPDATE
+    # ------------------------------------------------------
+    def append(self, value, row_id=None):
+        values = self.values
+        p = len(values)
+
+        # every window ending just before p now has a follower (p)
+        for L in range(1, min(self.max_len, p) + 1):
+            window = tuple(values[p - L:p])
+            self.index.setdefault(window, []).append(p - L)
+
+        values.append(value)
+        self.ids.append(row_id)
+
+    def extend(self, pairs):
+        for value, row_id in pairs:
+            self.append(value, row_id)
+
+    def extend_to(self, values, ids):
+        """
+        Bring the index up to a window of the latest draws (values / ids,
+        oldest first): append the draws newer than the ones held.
+        Returns where the window starts in the index, or None when the
+        window does not continue it (edited / back-dated / deleted draw,
+        or it reaches back before the index) and it must be rebuilt.
+        """
+        n = len(self.values)
+        if not n or not ids:
+            return None
+
+        try:
+            # newest draw held, searched from the end of the window
+            known = len(ids) - ids[::-1].index(self.ids[-1])
+        except ValueError:
+            return None
+
+        if known > n:
+            return None
+        if self.ids[n - known:] != ids[:known] or self.values[n - known:] != values[:known]:
+            return None
+
+        self.extend(zip(values[known:], ids[known:]))
+        return len(self.values) - len(values)
+
+    # ------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------
+    def follow(self, base_values, start=0):
+        """Matches of base_values starting at position >= start."""
+        L = len(base_values)
+        matched = list(base_values)
+        starts = self.index.get(tuple(base_values), ())
+
+        return [
+            {
+                "matched": matched,
+                "next": {
+                    "value": self.values[i + L],
+                    "id": self.ids[i + L]
+                }
+            }
+            for i in starts[bisect_left(starts, start):]
+        ]
+
+    def levels(self, start=0):
+        """
+        last4 / last3 / last2 / last1 (build_predictions shape),
+        over the values from position `start` on (a window of the index).
+        """
+        res = {}
+        n = len(self.values) - start
+
+        for L in range(self.max_len, 0, -1):
+            if n < L:
+                continue
+
+            base = [
+                {"value": v, "id": i}
+                for v, i in zip(self.values[-L:], self.ids[-L:])
+            ]
+            res[f"last{L}"] = {"base": base, "matches": self.follow(self.values[-L:], start)}
+
+        return res
+
+
+class FollowIndexCache:
+    """
+    Long-lived FollowIndex per (filter, field), shared by every window
+    size. A request passes its window of the latest draws: new draws at
+    the end extend the cached index, and matches are limited to the
+    window. Anything else (edited / back-dated draw, a window reaching
+    back before the index) rebuilds it from that window.
+    """
+
+    def __init__(self, max_entries=64, max_len=4):
+        self.max_entries = max_entries
+        self.max_len = max_len
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def levels(self, key, values, ids):
+        with self.lock:
+            idx = self.entries.pop(key, None)
+            start = idx.extend_to(values, ids) if idx is not None else None
+
+            if start is None:
+                idx = FollowIndex(self.max_len)
+                idx.extend(zip(values, ids))
+                start = 0
+
+            self.entries[key] = idx
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+            return idx.levels(start)
+
+
+class OccurrenceIndex:
+    """
+    Start positions of every fixed-width window of a growing sequence.
+
+    append() is O(width); first() / all() answer "where did the
+    trailing window appear before?" without scanning the sequence.
+    """
+
+    def __init__(self, width, values=()):
+        self.width = width
+        self.values = []
+        self.starts = {}       # tuple(window) -> [start, ...] oldest first
+        self.extend(values)
+
+    @classmethod
+    def build(cls, width, values):
+        """Index a whole sequence at once (windows grouped with NumPy)."""
+        arr = np.asarray(values)
+        idx = cls(width)
+        idx.values = arr.tolist()
+
+        if len(arr) >= width:
+            windows = np.lib.stride_tricks.sliding_window_view(arr, width)
+            uniq, inverse, counts = np.unique(
+                windows, axis=0, return_inverse=True, return_counts=True
+            )
+            order = np.argsort(inverse.ravel(), kind="stable")
+            groups = np.split(order, np.cumsum(counts)[:-1])
+            idx.starts = {
+                tuple(w): g.tolist() for w, g in zip(uniq.tolist(), groups)
+            }
+        return idx
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        self.values.append(value)
+        p = len(self.values) - self.width
+        if p >= 0:
+            self.starts.setdefault(tuple(self.values[p:]), []).append(p)
+
+    def extend(self, values):
+        for v in values:
+            self.append(v)
+
+    def all(self, window, limit):
+        """Starts of window that are <= limit, oldest first."""
+        starts = self.starts.get(tuple(window), ())
+        return [i for i in starts if i <= limit]
+
+    def first(self, window, limit):
+        starts = self.starts.get(tuple(window))
+        if starts and starts[0] <= limit:
+            return starts[0]
+        return None
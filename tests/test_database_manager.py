@@ -0,0 +1,94 @@
+# tests/test_database_manager.py
+# ------------------------------------------------------
+#  IDEMPOTENT IMPORT + ONE-ROW-PER-DRAW MIGRATION
+# ------------------------------------------------------
+
+import sqlite3
+import threading
+
+from database_manager import DatabaseManager
+
+
+def draw(day, slot, winner="11197", **override):
+    row = {
+        "lottery_name": "Test",
+        "date": f"{day} January 2025",
+        "time": slot,
+        "winner": winner,
+        "last4": winner[-4:],
+        "last3": winner[-3:],
+    }
+    row.update(override)
+    return row
+
+
+def stored_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM lottery_data").fetchone()[0]
+
+
+def test_reimport_is_a_no_op(tmp_path):
+    path = str(tmp_path / "lottery.db")
+    db = DatabaseManager(path)
+    rows = [draw(d, slot) for d in range(1, 6) for slot in ["1 PM", "6 PM"]]
+
+    assert db.store_lottery_data(rows) == {"inserted": 10, "updated": 0, "skipped": 0}
+    assert db.store_lottery_data(rows) == {"inserted": 0, "updated": 0, "skipped": 10}
+
+    rows[0] = draw(1, "1 PM", winner="22222")
+    assert db.store_lottery_data(rows) == {"inserted": 0, "updated": 1, "skipped": 9}
+    assert stored_rows(path) == 10
+
+
+def test_rows_without_a_key_are_skipped(tmp_path):
+    path = str(tmp_path / "lottery.db")
+    db = DatabaseManager(path)
+    rows = [
+        draw(1, "1 PM"),
+        draw(2, None),
+        draw(3, "6 PM", lottery_name=None),
+        draw(4, "6 PM", date=None),
+    ]
+
+    assert db.store_lottery_data(rows) == {"inserted": 1, "updated": 0, "skipped": 3}
+    for _ in range(2):
+        assert db.store_lottery_data(rows) == {"inserted": 0, "updated": 0, "skipped": 4}
+    assert stored_rows(path) == 1
+
+
+def test_concurrent_startup_migrates_once(tmp_path):
+    path = str(tmp_path / "lottery.db")
+    DatabaseManager(path).store_lottery_data([draw(1, "1 PM"), draw(2, "1 PM")])
+
+    # a database from before the unique key, with re-imported copies
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP INDEX uq_draw")
+        conn.execute("""
+            INSERT INTO lottery_data (lottery_name, date_col, time_col, winner)
+            SELECT lottery_name, date_col, time_col, winner FROM lottery_data
+        """)
+    assert stored_rows(path) == 4
+
+    errors = []
+    start = threading.Barrier(4)
+
+    def worker():
+        start.wait()
+        try:
+            DatabaseManager(path)
+        except Exception as exc:       # pragma: no cover - the failure mode
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert stored_rows(path) == 2
+
+    # running the migration again changes nothing
+    db = DatabaseManager(path)
+    db._init_db()
+    assert stored_rows(path) == 2
@@ -0,0 +1,462 @@
+# tests/test_pattern_engine.py
+# ------------------------------------------------------
+#  VECTORIZED / STREAMING ENGINE == ORIGINAL ENGINE
+# ------------------------------------------------------
+# The ref_* functions are the original pattern_engine implementations
+# (full rescans per step). Every optimized path must return exactly
+# what they return.
+
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from database_manager import DatabaseManager
+from digit_matrix import DigitMatrix
+from history_store import ColumnStore, HistorySnapshot, DIGIT_WIDTHS
+from pattern_engine import (
+    CATEGORIES,
+    ColumnDetectors,
+    ColumnState,
+    analyze_history_patterns,
+    analyze_next_series,
+    column_name,
+    compute_transitions,
+    decide_next,
+    detect_cycle,
+    detect_drift,
+    detect_freeze,
+    detect_mirror,
+    detect_reset,
+    forecast,
+    normalize,
+    predict_series,
+)
+
+
+# ============================================================
+# ORIGINAL ENGINE
+# ============================================================
+def ref_follow_fixed_sequence(seq, digits):
+    if len(seq) < digits + 1:
+        return None, None, None
+
+    base = seq[-digits:]
+    L = digits
+
+    for i in range(len(seq) - L - 1):
+        if seq[i:i + L] == base:
+            return seq[:i + L][-5:], base, seq[i + L:][:5]
+
+    return None, None, None
+
+
+def ref_decide_next(col, raw, mod, digits):
+    seq = col
+    last = seq[-1]
+
+    before, base, after = ref_follow_fixed_sequence(seq, digits)
+
+    results = {
+        "before": before, "base": base, "after": after,
+        "cycle": None, "mirror": None, "drift": None, "freeze": None,
+        "reset": None, "fallback": None, "custom": None
+    }
+
+    if base is not None:
+        results["final"] = after[0] if after else last
+        return results
+
+    cycle = detect_cycle(mod)
+    mirror = detect_mirror(mod)
+    drift = detect_drift(seq)
+    freeze = detect_freeze(seq)
+    reset = detect_reset(mod)
+
+    results["cycle"] = (last + cycle[0]) % 10 if cycle else None
+    results["mirror"] = (last + mirror) % 10 if mirror is not None else None
+
+    if drift == "UP":
+        results["drift"] = (last + 1) % 10
+    elif drift == "DOWN":
+        results["drift"] = (last - 1) % 10
+
+    results["freeze"] = freeze
+    results["reset"] = (last + Counter(mod).most_common(1)[0][0]) % 10 if reset else None
+    results["fallback"] = (last + mod[-1]) % 10 if mod else None
+
+    for key in ["cycle", "mirror", "drift", "freeze", "reset", "fallback"]:
+        if results[key] is not None:
+            results["final"] = results[key]
+            return results
+
+    results["final"] = last
+    return results
+
+
+def ref_columns(values, digits):
+    rows = []
+    for idx, col in enumerate(zip(*normalize(values, digits))):
+        col = list(col)
+        raw, mod = compute_transitions(col)
+        result = ref_decide_next(col, raw, mod, digits)
+        rows.append({
+            "column": column_name(idx, digits),
+            "column_data": col,
+            "raw": raw,
+            "mod": mod,
+            "patterns": result,
+            "next": result["final"]
+        })
+    return rows
+
+
+def ref_predict_series(values, digits, steps=5):
+    seq = list(values)
+    out = []
+
+    for _ in range(steps):
+        if len(normalize(seq, digits)) < 3:
+            break
+        next_val = "".join(str(r["next"]) for r in ref_columns(seq, digits))
+        out.append(next_val)
+        seq.append(next_val)
+
+    return out
+
+
+def ref_analyze_next_series(history_list, digits, next_series):
+    out = []
+    seq = list(history_list)
+
+    for step_index, val in enumerate(next_series, start=1):
+        out.append({"step": step_index, "value": val, "analysis": ref_columns(seq, digits)})
+        seq.append(val)
+
+    return out
+
+
+def ref_analyze_history_patterns(history):
+    output = {}
+
+    for key, digits in CATEGORIES.items():
+        values = history.get(key, [])
+        if len(normalize(values, digits)) < 3:
+            output[key] = {"error": "Not enough history"}
+            continue
+
+        analysis = ref_columns(values, digits)
+        final_prediction = "".join(str(r["next"]) for r in analysis)
+
+        next_series = ref_predict_series(values + [final_prediction], digits, 5)
+        output[key] = {
+            "analysis": analysis,
+            "prediction": final_prediction,
+            "next_series": next_series,
+            "combined_predictions": [final_prediction] + next_series,
+            "next_series_analysis": ref_analyze_next_series(
+                values + [final_prediction], digits, next_series
+            )
+        }
+
+    return output
+
+
+def plain(value):
+    """ColumnAnalysis rows / tuples / NumPy ints -> plain lists and dicts."""
+    if hasattr(value, "to_dict"):
+        return plain(value.to_dict())
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# ============================================================
+# INPUTS
+# ============================================================
+def random_column(rng, n):
+    return [rng.randrange(10) for _ in range(n)]
+
+
+def tie_column(rng, n):
+    # two or three symbols: long freezes, repeated cycles, mod ties
+    alphabet = rng.sample(range(10), rng.choice([2, 3]))
+    return [rng.choice(alphabet) for _ in range(n)]
+
+
+def columns(seed, count=150):
+    rng = random.Random(seed)
+    out = [[d] for d in range(10)] + [[5, 5], [1, 2, 3]]
+    for _ in range(count):
+        make = rng.choice([random_column, tie_column])
+        out.append(make(rng, rng.choice([2, 3, 4, 5, 6, 8, 13, 30, 60])))
+    return out
+
+
+def value_lists(seed, count=60):
+    """Category value lists, including junk normalize() has to skip."""
+    rng = random.Random(seed)
+    junk = ["", "x", "7", "12", "48B", "4-8", "  9 ", None]
+    out = [[], ["123"], ["12", "345"], ["0001", "0001", "0001"]]
+
+    for _ in range(count):
+        width = rng.choice([1, 2, 3, 4, 5])
+        tie = rng.random() < 0.4
+        alphabet = rng.sample("0123456789", 2) if tie else "0123456789"
+        values = []
+        for _ in range(rng.choice([0, 1, 2, 3, 4, 7, 20, 45])):
+            if rng.random() < 0.15:
+                values.append(rng.choice(junk))
+            else:
+                values.append("".join(rng.choice(alphabet) for _ in range(width)))
+        out.append(values)
+    return out
+
+
+# ============================================================
+# DETECTORS
+# ============================================================
+def expected_detectors(col, mod):
+    return {
+        "cycle": detect_cycle(mod),
+        "mirror": detect_mirror(mod),
+        "drift": detect_drift(col),
+        "freeze": detect_freeze(col),
+        "reset": detect_reset(mod),
+        "most_common": Counter(mod).most_common(1)[0][0] if mod else None,
+    }
+
+
+def detector_values(det, mod):
+    return {
+        "cycle": det.cycle.value(),
+        "mirror": det.mirror.value(),
+        "drift": det.drift.value(),
+        "freeze": det.freeze.value(),
+        "reset": det.reset.value(),
+        "most_common": det.reset.most_common() if mod else None,
+    }
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_detector_fit_matches_detect_functions(seed):
+    for col in columns(seed):
+        raw, mod = compute_transitions(col)
+        det = ColumnDetectors.fit(col, mod)
+        assert detector_values(det, mod) == expected_detectors(col, mod), col
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_detector_push_matches_detect_functions(seed):
+    for col in columns(seed, count=60):
+        det = ColumnDetectors()
+        det.push(col[0])
+
+        for n in range(2, len(col) + 1):
+            prefix = col[:n]
+            raw, mod = compute_transitions(prefix)
+            det.push(prefix[-1], mod[-1])
+            assert detector_values(det, mod) == expected_detectors(prefix, mod), prefix
+
+
+def test_push_after_fit_matches_fit():
+    rng = random.Random(7)
+    for _ in range(200):
+        col = rng.choice([random_column, tie_column])(rng, rng.randrange(2, 40))
+        cut = rng.randrange(1, len(col))
+        raw, mod = compute_transitions(col[:cut])
+        det = ColumnDetectors.fit(col[:cut], mod)
+
+        for x in col[cut:]:
+            det.push(x, (x - det.drift.prev) % 10)
+
+        raw, mod = compute_transitions(col)
+        assert detector_values(det, mod) == expected_detectors(col, mod), (col, cut)
+
+
+# ============================================================
+# DECISION + FORECAST
+# ============================================================
+@pytest.mark.parametrize("seed", range(4))
+def test_decide_next_with_state_matches_original(seed):
+    for col in columns(seed):
+        for digits in (1, 2, 3, 4):
+            state = ColumnState(col, "0", digits)
+            raw, mod = compute_transitions(col)
+            expected = ref_decide_next(col, raw, mod, digits)
+
+            assert plain(decide_next(col, raw, mod, "0", digits)) == plain(expected)
+            assert plain(state.analyze(tail=None).patterns) == plain(expected)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_predict_series_matches_original(seed):
+    for values in value_lists(seed):
+        for digits in (1, 2, 3, 4):
+            for steps in (1, 5):
+                assert predict_series(values, digits, steps) == \
+                    ref_predict_series(values, digits, steps), (values, digits)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_analyze_next_series_matches_original(seed):
+    for values in value_lists(seed):
+        for digits in (1, 2, 3):
+            series = ref_predict_series(values, digits, 5)
+            got = analyze_next_series(values, digits, series, tail=None)
+            assert plain(got) == ref_analyze_next_series(values, digits, series), values
+
+
+def test_forecast_rows_match_original_columns():
+    rng = random.Random(11)
+    for _ in range(40):
+        digits = rng.choice([1, 2, 3])
+        values = [
+            "".join(str(d) for d in rng.choice([random_column, tie_column])(rng, digits))
+            for _ in range(rng.randrange(3, 30))
+        ]
+        states = [
+            ColumnState(col, column_name(i, digits), digits)
+            for i, col in enumerate(zip(*normalize(values, digits)))
+        ]
+
+        seq = list(values)
+        for value, analysis in forecast(states, 3, tail=None):
+            assert plain(analysis) == ref_columns(seq, digits)
+            seq.append(value)
+
+
+def test_column_analysis_tail_is_suffix_of_full_rows():
+    rng = random.Random(3)
+    col = random_column(rng, 80)
+    full = forecast([ColumnState(col, "0", 1)], 5, tail=None)
+    short = forecast([ColumnState(col, "0", 1)], 5, tail=10)
+
+    for (_, [a]), (_, [b]) in zip(full, short):
+        assert b["column_data"] == a["column_data"][-10:]
+        assert b["raw"] == a["raw"][-10:]
+        assert b["mod"] == a["mod"][-10:]
+        assert b.next == a.next
+        assert b.to_dict()["patterns"] == a.to_dict()["patterns"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_analyze_history_patterns_matches_original(seed):
+    for values in value_lists(seed, count=20):
+        history = {key: list(values) for key in CATEGORIES}
+        got = analyze_history_patterns(history, tail=None)
+        assert plain(got) == ref_analyze_history_patterns(history), values
+
+
+# ============================================================
+# DIGIT MATRIX (STORED COLUMNS)
+# ============================================================
+SLOTS = ["1 PM", "6 PM", "8 PM"]
+
+
+def record(winner, day, slot, **override):
+    """save_record()'s digit split of a winner string."""
+    d = "".join(c for c in winner if c.isdigit())
+    row = {
+        "lottery_name": "Test",
+        "date": f"{day} January 2025",
+        "time": slot,
+        "winner": d,
+        "aaa_first": d[0] if len(d) >= 1 else "",
+        "aa_second": d[1] if len(d) >= 2 else "",
+        "a_third": d[2] if len(d) >= 3 else "",
+        "b_fourth": d[3] if len(d) >= 4 else "",
+        "c_last": d[-1] if len(d) >= 1 else "",
+        "last4": d[-4:] if len(d) >= 4 else d,
+        "last3": d[-3:] if len(d) >= 3 else d,
+        "ab": (d[2] + d[3]) if len(d) >= 4 else "",
+        "bc": (d[3] + d[-1]) if len(d) >= 4 else "",
+        "ac": (d[2] + d[-1]) if len(d) >= 3 else "",
+    }
+    row.update(override)
+    return row
+
+
+def build_store(tmp_path, records):
+    db = DatabaseManager(str(tmp_path / "lottery.db"))
+    db.store_lottery_data(records)
+    return db, ColumnStore(db).load()
+
+
+def assert_matrix_matches_history(db, store, time_filter=None):
+    view = store.view(time_filter)
+    matrix = DigitMatrix(view)
+    history = HistorySnapshot(db.get_all_history(time_filter)).history()
+
+    for key, digits in DIGIT_WIDTHS.items():
+        assert matrix[key].tolist() == normalize(history[key], digits), key
+        assert matrix[key].tolist() == view.digit_rows(key), key
+
+
+def test_digit_matrix_clean_winners_are_views(tmp_path):
+    rng = random.Random(5)
+    records = [
+        record("%05d" % rng.randrange(100000), day, slot)
+        for day in range(1, 29) for slot in SLOTS
+    ]
+    db, store = build_store(tmp_path, records)
+
+    matrix = DigitMatrix(store.view())
+    for key in DIGIT_WIDTHS:
+        assert np.shares_memory(matrix[key], matrix.winners), key   # no copy
+
+    for time_filter in (None, ["1 PM"], ["6 PM", "8 PM"]):
+        assert_matrix_matches_history(db, store, time_filter)
+
+
+def test_digit_matrix_malformed_and_short_winners(tmp_path):
+    rng = random.Random(9)
+    odd = ["123", "7", "", "48B 11197", "9876543", "12a45", "00"]
+    records = []
+
+    for day in range(1, 29):
+        for slot in SLOTS:
+            r = rng.random()
+            if r < 0.2:
+                records.append(record(rng.choice(odd), day, slot))
+            elif r < 0.3:
+                # category fields that disagree with the winner
+                records.append(record("%05d" % rng.randrange(100000), day, slot,
+                                      last4="", ab="9", ac="x1"))
+            else:
+                records.append(record("%05d" % rng.randrange(100000), day, slot))
+
+    db, store = build_store(tmp_path, records)
+
+    for time_filter in (None, ["1 PM"], ["6 PM", "8 PM"]):
+        assert_matrix_matches_history(db, store, time_filter)
+
+
+def test_digit_matrix_very_short_history(tmp_path):
+    db, store = build_store(tmp_path, [record("12345", 1, "1 PM"), record("1", 2, "1 PM")])
+    assert_matrix_matches_history(db, store)
+
+    empty = DatabaseManager(str(tmp_path / "empty.db"))
+    view = ColumnStore(empty).load().view()
+    for key, digits in DIGIT_WIDTHS.items():
+        assert DigitMatrix(view)[key].shape == (0, digits)
+
+
+def test_analyze_history_patterns_from_store_matches_original(tmp_path):
+    rng = random.Random(13)
+    odd = ["123", "7", "48B 11197", "00"]
+    records = [
+        record(rng.choice(odd) if rng.random() < 0.1 else "%05d" % rng.randrange(100000), day, slot)
+        for day in range(1, 21) for slot in SLOTS
+    ]
+    db, store = build_store(tmp_path, records)
+
+    for time_filter in (None, ["8 PM"]):
+        history = HistorySnapshot(db.get_all_history(time_filter)).history()
+        got = analyze_history_patterns(store.view(time_filter), tail=None)
+        assert plain(got) == ref_analyze_history_patterns(history)
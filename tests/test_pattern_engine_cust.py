@@ -0,0 +1,248 @@
+# tests/test_pattern_engine_cust.py
+# ------------------------------------------------------
+#  INCREMENTAL SERIES STATE == ORIGINAL PatternEngine
+# ------------------------------------------------------
+# The ref_* functions are the original PatternEngine methods (row
+# table rebuilt and rescanned for every step).
+
+import random
+
+import pytest
+
+from pattern_engine_cust import DigitSeriesState, PatternEngine
+
+
+# ============================================================
+# ORIGINAL ENGINE
+# ============================================================
+def ref_split_digits(value):
+    v = str(value).zfill(3)
+    return int(v[0]), int(v[1]), int(v[2])
+
+
+def ref_build_rows(values_list):
+    rows = []
+    prevA = prevB = prevC = None
+
+    for v in values_list:
+        A, B, C = ref_split_digits(v)
+
+        if prevA is None:
+            diffA = diffB = diffC = None
+        else:
+            diffA = A - prevA
+            diffB = B - prevB
+            diffC = C - prevC
+
+        rows.append({
+            "value": str(v).zfill(3),
+            "A": A,
+            "B": B,
+            "C": C,
+            "diffA": diffA,
+            "diffB": diffB,
+            "diffC": diffC
+        })
+
+        prevA, prevB, prevC = A, B, C
+
+    return rows
+
+
+def ref_detect_mirror_pattern(rows):
+    for r in reversed(rows):
+        if r["A"] == r["B"] and r["A"] != r["C"]:
+            return r["A"]
+    return None
+
+
+def ref_last3_trend(rows):
+    diffs = [r["diffA"] for r in rows if r["diffA"] is not None]
+
+    if len(diffs) == 0:
+        return None
+    if len(diffs) == 1:
+        return [diffs[0], diffs[0], diffs[0]]
+    if len(diffs) == 2:
+        return [diffs[0], diffs[1], diffs[1]]
+    return diffs[-3:]
+
+
+def ref_last1_digit_logic(rows):
+    if len(rows) == 1:
+        A, B, C = rows[0]["A"], rows[0]["B"], rows[0]["C"]
+        return f"{A}{B}{(C + 1) % 10}"
+    return None
+
+
+def ref_compute_next(values_list):
+    if not values_list:
+        return "000"
+
+    rows = ref_build_rows(values_list)
+
+    last1 = ref_last1_digit_logic(rows)
+    if last1 is not None:
+        return last1
+
+    mirror_digit = ref_detect_mirror_pattern(rows)
+    if mirror_digit is not None:
+        B_next = mirror_digit - 1 if mirror_digit > 0 else 0
+        return f"{mirror_digit}{B_next}0"
+
+    trend = ref_last3_trend(rows)
+    if trend is not None:
+        return f"{trend[-1] % 10}{trend[-2] % 10}{trend[-3] % 10}"
+
+    last = rows[-1]
+    return f"{last['A']}{last['B']}{last['C']}"
+
+
+def ref_compute_next_multiple(values_list, count=5):
+    result_list = []
+    current_list = list(values_list)
+
+    for _ in range(count):
+        nxt = ref_compute_next(current_list)
+        result_list.append(nxt)
+        current_list.append(nxt)
+
+    return result_list
+
+
+def ref_compute_next_single_digit(digit_list):
+    digits = [int(d) for d in digit_list if str(d).isdigit()]
+
+    if len(digits) < 2:
+        return digits[-1]
+
+    if digits[-1] == digits[-2]:
+        return (digits[-1] - 1) % 10
+
+    diffs = []
+    for i in range(1, len(digits)):
+        diffs.append(digits[i] - digits[i - 1])
+
+    if len(diffs) >= 3:
+        d1, d2, d3 = diffs[-3], diffs[-2], diffs[-1]
+        if d1 == d2 == d3:
+            return (digits[-1] + d3) % 10
+
+    last = digits[-1]
+    prev = digits[-2]
+    return (last + (last - prev)) % 10
+
+
+def ref_compute_next_single_digit_multiple(digit_list, count=5):
+    results = []
+    history = digit_list.copy()
+
+    for _ in range(count):
+        nxt = ref_compute_next_single_digit(history)
+        results.append(nxt)
+        history.append(str(nxt))
+
+    return results
+
+
+# ============================================================
+# INPUTS
+# ============================================================
+def random_values(rng):
+    """3-digit draws as str / int, some mirrors (A == B != C), some short."""
+    out = []
+    for _ in range(rng.choice([1, 2, 3, 4, 10, 60])):
+        kind = rng.random()
+        if kind < 0.2:
+            a = rng.randint(0, 9)
+            out.append(f"{a}{a}{(a + rng.randint(1, 9)) % 10}")
+        elif kind < 0.4:
+            out.append(rng.randint(0, 999))
+        elif kind < 0.5:
+            out.append(str(rng.randint(0, 99)))          # zero-padded
+        else:
+            out.append(f"{rng.randint(0, 999):03d}")
+    return out
+
+
+def random_digits(rng):
+    """Digits as str / int, ties and steady trends, plus junk entries."""
+    out = []
+    for _ in range(rng.choice([1, 2, 3, 4, 5, 40])):
+        kind = rng.random()
+        if kind < 0.15 and out:
+            out.append(out[-1])                           # mirror
+        elif kind < 0.25:
+            out.append(rng.choice(["", "x", "-1", None, " 5"]))
+        elif kind < 0.5:
+            out.append(rng.randint(0, 9))
+        else:
+            out.append(str(rng.randint(0, 9)))
+    if not any(str(d).isdigit() for d in out):
+        out.append(str(rng.randint(0, 9)))
+    return out
+
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+@pytest.mark.parametrize("seed", range(200))
+def test_compute_next_matches_original(seed):
+    rng = random.Random(seed)
+    engine = PatternEngine()
+    values = random_values(rng)
+
+    assert engine.compute_next(values) == ref_compute_next(values)
+    assert engine.compute_next_multiple(values, 7) == ref_compute_next_multiple(values, 7)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_single_digit_matches_original(seed):
+    rng = random.Random(seed)
+    engine = PatternEngine()
+    digits = random_digits(rng)
+
+    assert engine.compute_next_single_digit(digits) == ref_compute_next_single_digit(digits)
+    assert (engine.compute_next_single_digit_multiple(digits, 7)
+            == ref_compute_next_single_digit_multiple(digits, 7))
+
+
+def test_empty_series():
+    engine = PatternEngine()
+    assert engine.compute_next([]) == ref_compute_next([]) == "000"
+    assert engine.compute_next_multiple([], 3) == ref_compute_next_multiple([], 3)
+
+    with pytest.raises(IndexError):
+        ref_compute_next_single_digit(["x"])
+    with pytest.raises(IndexError):
+        engine.compute_next_single_digit(["x"])
+
+
+def test_incremental_append_matches_rebuild():
+    rng = random.Random(7)
+    values = random_values(random.Random(3)) + [f"{rng.randint(0, 999):03d}" for _ in range(30)]
+    state = PatternEngine().start()
+    digits = DigitSeriesState()
+
+    for i, v in enumerate(values):
+        state.append(v)
+        digits.append(str(v)[-1])
+        assert state.next() == ref_compute_next(values[:i + 1])
+        assert digits.next() == ref_compute_next_single_digit([str(x)[-1] for x in values[:i + 1]])
+
+
+def test_batch_keeps_shape():
+    rng = random.Random(11)
+    engine = PatternEngine()
+    series = {slot: random_values(rng) for slot in ["1 PM", "6 PM", "8 PM"]}
+    digit_series = [random_digits(rng) for _ in range(4)]
+    before = ({k: list(v) for k, v in series.items()}, [list(d) for d in digit_series])
+
+    assert engine.compute_next_batch(series, 4) == {
+        k: ref_compute_next_multiple(v, 4) for k, v in series.items()
+    }
+    assert engine.compute_next_single_digit_batch(digit_series, 4) == [
+        ref_compute_next_single_digit_multiple(d, 4) for d in digit_series
+    ]
+    # inputs are left untouched
+    assert (series, digit_series) == before
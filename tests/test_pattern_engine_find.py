@@ -0,0 +1,192 @@
+# tests/test_pattern_engine_find.py
+# ------------------------------------------------------
+#  TRANSITION TENSORS == ORIGINAL EMPIRICAL PREDICTOR
+# ------------------------------------------------------
+# ref_train_rules / ref_empirical_predict / ref_analyze_patterns are
+# the original pattern_engine_find implementations (Counter maps
+# retrained from scratch for every row).
+
+import random
+from collections import defaultdict, Counter
+
+import numpy as np
+import pytest
+
+from pattern_engine_find import (
+    TransitionTensors,
+    _clean_digits_str,
+    analyze_patterns,
+    code_str,
+    to_codes,
+)
+
+
+# ============================================================
+# ORIGINAL ENGINE
+# ============================================================
+def ref_train_rules(cleaned_seq):
+    full_map_counts = defaultdict(Counter)
+    pos_map_counts = {i: defaultdict(Counter) for i in range(1, 6)}
+
+    for i in range(1, len(cleaned_seq)):
+        prev = cleaned_seq[i - 1]
+        cur = cleaned_seq[i]
+
+        full_map_counts[prev][cur] += 1
+
+        for pos in range(5):
+            if pos >= len(prev) or pos >= len(cur):
+                continue
+            if not prev[pos].isdigit() or not cur[pos].isdigit():
+                continue
+            pos_map_counts[pos + 1][int(prev[pos])][int(cur[pos])] += 1
+
+    full_map = {}
+    for prev, cnt in full_map_counts.items():
+        full_map[prev] = cnt.most_common(1)[0][0]
+
+    pos_map = {i: {} for i in range(1, 6)}
+    for pos in range(1, 6):
+        for pd, cnt in pos_map_counts[pos].items():
+            pos_map[pos][pd] = cnt.most_common(1)[0][0]
+
+    return full_map, pos_map
+
+
+def ref_empirical_predict(prev_full, full_map, pos_map):
+    prev_full = _clean_digits_str(prev_full)
+
+    full_map_pred = full_map.get(prev_full)
+
+    digit_pred = []
+    for pos in range(1, 6):
+        digit = int(prev_full[pos - 1])
+        digit_pred.append(str(pos_map[pos].get(digit, digit)))
+    digit_pred = "".join(digit_pred)
+
+    last_digit = int(prev_full[-1])
+    mirror_pred = prev_full[:-1] + str((last_digit + 5) % 10)
+    trend_pred = prev_full[:-1] + str((last_digit + 1) % 10)
+
+    votes = Counter()
+    if full_map_pred:
+        votes[full_map_pred] += 5
+    votes[digit_pred] += 3
+    votes[mirror_pred] += 1
+    votes[trend_pred] += 1
+
+    return votes.most_common(1)[0][0]
+
+
+def ref_analyze_patterns(history, last_n=10):
+    cleaned = [_clean_digits_str(row.get("winner", "")) for row in history]
+    times = [row.get("time_col") for row in history]
+    pattern_rows = []
+
+    for i, prev in enumerate(cleaned):
+        slice1 = cleaned[: i + 1]
+        next1 = ref_empirical_predict(prev, *ref_train_rules(slice1))
+
+        slice2 = slice1 + [next1]
+        next2 = ref_empirical_predict(next1, *ref_train_rules(slice2))
+
+        slice3 = slice2 + [next2]
+        next3 = ref_empirical_predict(next2, *ref_train_rules(slice3))
+
+        rev = [int(d) for d in next1][::-1]
+        pattern_rows.append({
+            "Pattern": "Empirical-Historical",
+            "index": i,
+            "winner": prev,
+            "time_col": times[i],
+            "next1": next1,
+            "next2": next2,
+            "next3": next3,
+            "aaa": rev[4],
+            "aa": rev[3],
+            "a": rev[2],
+            "b": rev[1],
+            "c": rev[0],
+        })
+
+    return {"rows": pattern_rows[-last_n:], "rules": {}}
+
+
+# ============================================================
+# INPUTS
+# ============================================================
+def random_winners(rng, n):
+    return [f"{rng.randint(0, 99999):05d}" for _ in range(n)]
+
+
+def tie_winners(rng, n):
+    """Few distinct winners and digits: most counts are tied."""
+    pool = ["11111", "11112", "22221", "11116", "12345", "00000"]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def malformed_winners(rng, n):
+    junk = ["", "abc", "7", "12-34", "1234567", " 0162 0", None]
+    return [rng.choice(junk) if rng.random() < 0.3 else f"{rng.randint(0, 999):d}"
+            for _ in range(n)]
+
+
+GENERATORS = [random_winners, tie_winners, malformed_winners]
+
+
+def history(winners):
+    slots = ["1 PM", "6 PM", "8 PM"]
+    return [{"winner": w, "time_col": slots[i % 3]} for i, w in enumerate(winners)]
+
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+@pytest.mark.parametrize("make", GENERATORS)
+@pytest.mark.parametrize("seed", range(5))
+def test_predict_matches_empirical_predict(make, seed):
+    rng = random.Random(seed)
+    cleaned = [_clean_digits_str(w) for w in make(rng, rng.randint(0, 80))]
+    model = TransitionTensors().fit(to_codes(cleaned))
+    full_map, pos_map = ref_train_rules(cleaned)
+
+    # every seen winner plus unseen ones
+    prevs = sorted(set(cleaned)) + random_winners(rng, 20)
+    got = model.predict(to_codes(prevs)) if prevs else []
+    assert [code_str(c) for c in got] == [
+        ref_empirical_predict(p, full_map, pos_map) for p in prevs
+    ]
+
+
+@pytest.mark.parametrize("make", GENERATORS)
+@pytest.mark.parametrize("seed", range(5))
+def test_add_remove_matches_retraining(make, seed):
+    rng = random.Random(seed)
+    cleaned = [_clean_digits_str(w) for w in make(rng, rng.randint(1, 40))]
+    model = TransitionTensors().fit(to_codes(cleaned))
+
+    extra = [_clean_digits_str(w) for w in make(rng, 3)]
+    chain = cleaned[-1:] + extra
+    for prev, cur in zip(chain, chain[1:]):
+        model.add(int(prev), int(cur))
+
+    full_map, pos_map = ref_train_rules(cleaned + extra)
+    for p in set(cleaned + extra):
+        assert code_str(model.predict_one(int(p))) == ref_empirical_predict(p, full_map, pos_map)
+
+    for prev, cur in reversed(list(zip(chain, chain[1:]))):
+        model.remove(int(prev), int(cur))
+    fresh = TransitionTensors().fit(to_codes(cleaned))
+    assert model.t == fresh.t
+    assert np.array_equal(model.pos_counts, fresh.pos_counts)
+    assert np.array_equal(model.best, fresh.best)
+
+
+@pytest.mark.parametrize("make", GENERATORS)
+@pytest.mark.parametrize("seed", range(4))
+def test_analyze_patterns_matches_original(make, seed):
+    rng = random.Random(seed)
+    rows = history(make(rng, rng.choice([0, 1, 2, 5, 11, 60])))
+
+    for last_n in (1, 10, 1000):
+        assert analyze_patterns(rows, last_n) == ref_analyze_patterns(rows, last_n)
@@ -0,0 +1,58 @@
+# tests/test_sequence_index.py
+# ------------------------------------------------------
+#  SHARED FOLLOW INDEX == ONE BUILT PER WINDOW
+# ------------------------------------------------------
+
+import random
+
+import pytest
+
+from sequence_index import FollowIndex, FollowIndexCache
+
+
+def ref_levels(values, ids):
+    return FollowIndex.build([{"value": v, "id": i} for v, i in zip(values, ids)]).levels()
+
+
+def window(values, ids, n):
+    return (values[-n:], ids[-n:]) if n else ([], [])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sliding_window_matches_fresh_index(seed):
+    rng = random.Random(seed)
+    cache = FollowIndexCache()
+    values = [str(rng.randint(0, 3)) for _ in range(rng.randint(0, 150))]
+    ids = list(range(len(values)))
+    next_id = len(values)
+
+    for _ in range(30):
+        n = rng.choice([0, 1, 3, 10, 50, 1000])
+        w_values, w_ids = window(values, ids, n)
+        assert cache.levels("*", w_values, w_ids) == ref_levels(w_values, w_ids)
+
+        # new draws, now and then an edited or deleted one
+        for _ in range(rng.randint(0, 3)):
+            values.append(str(rng.randint(0, 3)))
+            ids.append(next_id)
+            next_id += 1
+        if values and rng.random() < 0.2:
+            values[rng.randrange(len(values))] = "9"
+        if values and rng.random() < 0.1:
+            del_at = rng.randrange(len(values))
+            del values[del_at], ids[del_at]
+
+
+def test_one_index_per_filter_and_field_is_extended():
+    cache = FollowIndexCache()
+    values = ["1", "2", "1", "2", "1"]
+    ids = list(range(5))
+
+    cache.levels("*", values[-3:], ids[-3:])
+    idx = cache.entries["*"]
+
+    values += ["2", "1"]
+    ids += [5, 6]
+    assert cache.levels("*", values[-3:], ids[-3:]) == ref_levels(values[-3:], ids[-3:])
+    assert cache.entries["*"] is idx
+    assert idx.ids == [2, 3, 4, 5, 6]